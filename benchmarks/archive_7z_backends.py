@@ -0,0 +1,63 @@
+"""
+Compare extraction time of 7z archives with every available backend of `launcher.archive`
+
+Usage, from repository root: python -m benchmarks.archive_7z_backends [archive.7z ...]
+
+Without argument, a synthetic archive (many small script files and a few large textures)
+is built with py7zr in a temporary directory
+"""
+
+from os import urandom
+from pathlib import Path
+from sys import argv
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from py7zr import SevenZipFile
+
+from launcher.archive import _is_available, sevenzip_backends
+
+
+def make_archive(to: Path) -> Path:
+    src = to / 'src'
+    for i in range(2000):
+        file = src / 'gamedata' / 'scripts' / f'{i // 100}' / f'file_{i}.script'
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text(f'-- script {i}\n' * 200)
+
+    (src / 'gamedata' / 'textures').mkdir(parents=True)
+    for i in range(8):
+        (src / 'gamedata' / 'textures' / f'texture_{i}.dds').write_bytes(urandom(1 << 20) * 16)
+
+    archive = to / 'synthetic.7z'
+    with SevenZipFile(archive, 'w') as z:
+        z.writeall(src / 'gamedata', 'gamedata')
+    return archive
+
+
+def bench(archive: Path, tmp: Path) -> None:
+    print(f'{archive.name} ({archive.stat().st_size / 2**20:.1f} MiB)')
+    for name, backend in sevenzip_backends.items():
+        if not _is_available(backend.executable):
+            print(f'  {name:<8} not available')
+            continue
+
+        with TemporaryDirectory(dir=tmp) as out:
+            start = perf_counter()
+            try:
+                backend.extractall(str(archive), out)
+            except Exception as e:
+                print(f'  {name:<8} failed: {e}')
+                continue
+            print(f'  {name:<8} {perf_counter() - start:.2f}s')
+
+
+def main() -> None:
+    with TemporaryDirectory() as dir:
+        archives = [Path(i) for i in argv[1:]] or [make_archive(Path(dir))]
+        for archive in archives:
+            bench(archive, Path(dir))
+
+
+if __name__ == '__main__':
+    main()
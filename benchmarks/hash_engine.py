@@ -0,0 +1,79 @@
+"""
+Compare MD5 throughput of `launcher.hash.hash_file` methods with the previous
+1 MiB read loop updating `tqdm` for every chunk
+
+Usage, from repository root: python -m benchmarks.hash_engine [size in GiB, default: 2] [runs, default: 3]
+
+A synthetic file of the given size is written in a temporary directory and read once
+before measuring, so every method hashes from the page cache
+"""
+
+from hashlib import md5
+from os import devnull, urandom
+from pathlib import Path
+from sys import argv
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from tqdm import tqdm
+
+import launcher.hash
+from launcher.hash import compute_hash, hash_methods
+
+
+def legacy_hash(file: Path) -> str:
+    hash = md5()
+    with open(file, 'rb') as f, open(devnull, 'w') as null, tqdm(
+        unit="iB", unit_scale=True, unit_divisor=1024, total=file.stat().st_size, file=null
+    ) as progress:
+        while True:
+            s = f.read(1024*1024)
+            if not s:
+                break
+            hash.update(s)
+            progress.update(len(s))
+
+    return hash.hexdigest()
+
+
+def make_file(file: Path, size: int) -> None:
+    block = urandom(64 * 1024 * 1024)
+    with open(file, 'wb') as f:
+        for _ in range(size // len(block)):
+            f.write(block)
+        f.write(block[:size % len(block)])
+
+
+def engine_hash(method: str, file: Path) -> str:
+    launcher.hash.hash_method = method
+    with open(devnull, 'w') as null, tqdm(
+        unit="iB", unit_scale=True, unit_divisor=1024, total=file.stat().st_size, file=null
+    ) as progress:
+        hash = md5()
+        launcher.hash.hash_file(file, [hash], progress=progress)
+    return hash.hexdigest()
+
+
+def main() -> None:
+    size = int(float(argv[1]) * 2**30) if len(argv) > 1 else 2 * 2**30
+    runs = int(argv[2]) if len(argv) > 2 else 3
+
+    with TemporaryDirectory() as dir:
+        file = Path(dir) / 'synthetic.bin'
+        make_file(file, size)
+        expected = compute_hash(file, display=False)
+
+        candidates = {'legacy': legacy_hash, **{i: lambda f, m=i: engine_hash(m, f) for i in hash_methods}}
+        print(f'{size / 2**30:.1f} GiB, best of {runs} runs')
+        for name, func in candidates.items():
+            best = None
+            for _ in range(runs):
+                start = perf_counter()
+                if func(file) != expected:
+                    raise RuntimeError(f'{name} returned a wrong digest')
+                elapsed = perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f'  {name:<12} {size / 2**20 / best:8.0f} MiB/s')
+
+
+if __name__ == '__main__':
+    main()
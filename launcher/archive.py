@@ -4,12 +4,29 @@ Module for archive extraction & listing
 Currently support 7z, RAR & ZIP
 """
 
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache, partial
+from multiprocessing import get_context
+from os import unlink
+from pathlib import Path
 from platform import system
 from py7zr import SevenZipFile
+from re import sub
+from shutil import which
+from struct import Struct, unpack_from
 from subprocess import run
-from typing import List
+from tempfile import NamedTemporaryFile
+from typing import Any, BinaryIO, Callable, Dict, List, NamedTuple, Optional, Tuple
 from unrar.rarfile import RarFile
-from zipfile import ZipFile
+from zipfile import ZipFile, compressor_names
+from zlib import MAX_WBITS, crc32, decompressobj
+
+from launcher.cache import file_identity, read_json, sidecar_prefix, write_json
+from launcher.fileops import unlink_before_write
+
+archive_index_dirname: str = f'{sidecar_prefix}archive-index'
+"Name of the directory caching `archive_index` results, one JSON file per archive, stored in archive directories"
 
 
 def get_mime_from_file(filename: str) -> str:
@@ -36,39 +53,187 @@ def get_mime_from_file(filename: str) -> str:
     raise Exception(f'File {filename} download failed, output is a unknown file type')
 
 
-if system() == 'Windows':
-    class Win32ExtractError(Exception):
-        pass
+def _list_file(members: List[str], escape: Callable[[str], str] = lambda x: x) -> str:
+    with NamedTemporaryFile('w', encoding='utf-8', suffix='.txt', delete=False) as lst:
+        lst.write('\n'.join(map(escape, members)))
+    return lst.name
+
+
+def _7z_include_list(f: str, p: str, members: List[str], shell: bool = False, exe: str = '7z') -> int:
+    # Member names are given through a list file, wildcards disabled
+    lst = _list_file(members)
+    try:
+        return run(
+            [exe, 'x', '-y', '-mmt=on', '-spd', '-scsUTF-8', f'-o{p}', f, f'@{lst}'], shell=shell
+        ).returncode
+    finally:
+        unlink(lst)
+
+
+class Win32ExtractError(Exception):
+    pass
+
+
+def _win32_check(f: str, returncode: int) -> None:
+    if returncode != 0:
+        raise Win32ExtractError(
+            f'Error while decompressing with 7z file: {f}\n'
+            'Make sure 7z is installed in default path, if not use '
+            'LAUNCHER_WIN32_7Z_PATH to set it'
+        )
+
+
+def _win32_extract(f: str, p: str) -> None:
+    _win32_check(f, run(['7z', 'x', '-y', f'-o{p}', f], shell=True).returncode)
+
+
+def _win32_extract_members(f: str, p: str, members: List[str]) -> None:
+    _win32_check(f, _7z_include_list(f, p, members, shell=True))
+
+
+def _check_tool(exe: str, f: str, returncode: int) -> None:
+    if returncode != 0:
+        raise RuntimeError(f'{exe} error while decompressing {f}')
+
+
+def _7z_cli_extractall(exe: str, f: str, p: str) -> None:
+    _check_tool(exe, f, run([exe, 'x', '-y', '-mmt=on', f'-o{p}', f]).returncode)
+
+
+def _7z_cli_extract_members(exe: str, f: str, p: str, members: List[str]) -> None:
+    _check_tool(exe, f, _7z_include_list(f, p, members, exe=exe))
+
+
+def _bsdtar_extract(f: str, p: str, members: List[str] = None) -> None:
+    # Unlike 7-Zip, bsdtar does not create the output directory
+    Path(p).mkdir(parents=True, exist_ok=True)
+    if members is None:
+        _check_tool('bsdtar', f, run(['bsdtar', '-x', '-f', f, '-C', p]).returncode)
+        return
+
+    # Names are patterns for bsdtar
+    lst = _list_file(members, lambda x: sub(r'([\\*?\[])', r'\\\1', x))
+    try:
+        _check_tool('bsdtar', f, run(['bsdtar', '-x', '-f', f, '-C', p, '-T', lst]).returncode)
+    finally:
+        unlink(lst)
+
+
+def _py7zr_extractall(f: str, p: str) -> None:
+    with SevenZipFile(f) as archive:
+        archive.extractall(p)
+
+
+def _py7zr_extract_members(f: str, p: str, members: List[str]) -> None:
+    with SevenZipFile(f) as archive:
+        archive.extract(p, targets=set(members))
+
+
+class SevenZipBackend(NamedTuple):
+    "Tool used to extract 7z archives"
+
+    executable: Optional[str]
+    "Program needed in PATH, None for a Python implementation"
+
+    bcj2: bool
+    "Support of BCJ2 filter"
+
+    extractall: Callable[[str, str], None]
+    extract_members: Callable[[str, str, List[str]], None]
+
+
+sevenzip_backends: Dict[str, SevenZipBackend] = {
+    **{
+        exe: SevenZipBackend(exe, True, partial(_7z_cli_extractall, exe), partial(_7z_cli_extract_members, exe))
+        for exe in ('7zz', '7z', '7za')
+    },
+    'bsdtar': SevenZipBackend('bsdtar', True, _bsdtar_extract, _bsdtar_extract),
+    'py7zr': SevenZipBackend(None, False, _py7zr_extractall, _py7zr_extract_members),
+}
+"""Available 7z extraction backends, in order of preference: native 7-Zip first,
+libarchive then py7zr (compare them with benchmarks/archive_7z_backends.py)"""
+
+sevenzip_backend: str = 'auto'
+"Backend used for 7z archives, a key of `sevenzip_backends` or 'auto' for the first available one"
+
+
+@lru_cache(maxsize=None)
+def _is_available(executable: Optional[str]) -> bool:
+    return executable is None or which(executable) is not None
+
+
+def _7zip_backend(f: str) -> SevenZipBackend:
+    # Selected backend first, others are fallbacks if not available or without BCJ2 support
+    names = ([sevenzip_backend] if sevenzip_backend != 'auto' else []) + list(sevenzip_backends)
+    bcj2 = None
+    for backend in (sevenzip_backends[i] for i in names):
+        if not _is_available(backend.executable):
+            continue
 
-    def _win32_extract(f: str, p: str) -> None:
-        if run(['7z', 'x', '-y', f'-o{p}', f], shell=True).returncode != 0:
-            raise Win32ExtractError(
-                f'Error while decompressing with 7z file: {f}\n'
-                'Make sure 7z is installed in default path, if not use '
-                'LAUNCHER_WIN32_7Z_PATH to set it'
-            )
+        if not backend.bcj2:
+            with SevenZipFile(f) as archive:
+                bcj2 = 'BCJ2*' in archive.archiveinfo().method_names if bcj2 is None else bcj2
+            if bcj2:
+                continue
 
+        return backend
+
+    raise RuntimeError(f'No tool available to extract {f}, please install 7-Zip')
+
+
+def _init_extract_worker(backend: str) -> None:
+    global sevenzip_backend
+    sevenzip_backend = backend
+
+
+def extract_pool(jobs: int) -> ProcessPoolExecutor:
+    """Create a process pool to decompress several archives at once with `extract_archive`
+    or `extract_members`, workers use the current `sevenzip_backend`
+
+    Workers are spawned, not forked, as download threads are running when archives are extracted
+
+    Argument(s):
+    * jobs -- Number of worker processes
+    """
+    return ProcessPoolExecutor(
+        max_workers=jobs, mp_context=get_context('spawn'),
+        initializer=_init_extract_worker, initargs=(sevenzip_backend,)
+    )
+
+
+def _7zip_extractall(f: str, p: str) -> None:
+    _7zip_backend(f).extractall(f, p)
+
+
+def _7zip_extract_members(f: str, p: str, members: List[str]) -> None:
+    _7zip_backend(f).extract_members(f, p, members)
+
+
+if system() == 'Windows':
     _extract_func_dict = {
         'application/x-7z-compressed': _win32_extract,
         'application/x-rar': _win32_extract,
         'application/zip': _win32_extract,
     }
-else:
-    def _7zip_bcj2_workaround(f: str, p: str) -> None:
-        if run(['7z', 'x', '-y', f'-o{p}', f]).returncode != 0:
-            raise RuntimeError(f'7z error while decompressing {f}')
-
-    def _7zip_extractall(f: str, p: str) -> None:
-        archive = SevenZipFile(f)
-
-        _7zip_bcj2_workaround(f, p) if 'BCJ2*' in archive.archiveinfo().method_names else archive.extractall(p)
 
+    _extract_members_func_dict = {
+        'application/x-7z-compressed': _win32_extract_members,
+        'application/x-rar': _win32_extract_members,
+        'application/zip': _win32_extract_members,
+    }
+else:
     _extract_func_dict = {
         'application/x-7z-compressed': _7zip_extractall,
         'application/x-rar': lambda f, p: RarFile(f'{f}').extractall(f'{p}'),
         'application/zip': lambda f, p: ZipFile(f).extractall(p),
     }
 
+    _extract_members_func_dict = {
+        'application/x-7z-compressed': _7zip_extract_members,
+        'application/x-rar': lambda f, p, m: RarFile(f'{f}').extractall(f'{p}', members=set(m)),
+        'application/zip': lambda f, p, m: ZipFile(f).extractall(p, members=m),
+    }
+
 
 def extract_archive(filename: str, path: str, mime: str = None) -> None:
     """Extract the archive to a directory
@@ -84,6 +249,33 @@ def extract_archive(filename: str, path: str, mime: str = None) -> None:
     _extract_func_dict.get(mime)(filename, path)
 
 
+def extract_members(
+    filename: str, path: str, predicate: Callable[[str], bool], mime: str = None, members: List[str] = None
+) -> List[str]:
+    """Extract only some members of the archive to a directory, others are not decompressed when
+    the format allows it (ie: non-solid archives)
+
+    Argument(s):
+    * filename -- File path of the archive to extract as str
+    * path -- Path where to extract the archive content as str
+    * predicate -- Called with each member path as listed by `list_archive_content`,
+      members for which it returns True are extracted
+
+    Keyword argument(s):
+    * mime -- Set a MIME type instead of determining it with `get_mime_from_file`
+    * members -- Set member paths instead of listing them with `list_archive_content`
+      (ie: from `archive_index`)
+
+    Return the list of extracted member paths
+    """
+    mime = mime or get_mime_from_file(filename)
+    members = list(filter(predicate, list_archive_content(filename, mime) if members is None else members))
+    if members:
+        _extract_members_func_dict.get(mime)(filename, path, members)
+
+    return members
+
+
 def list_archive_content(filename: str, mime: str = None) -> List[str]:
     """List archive content
 
@@ -98,6 +290,271 @@ def list_archive_content(filename: str, mime: str = None) -> List[str]:
     mime = mime or get_mime_from_file(filename)
     return {
         'application/x-7z-compressed': lambda f: SevenZipFile(f).getnames(),
-        'application/x-rar': lambda f: RarFile(f).namelist(),
+        'application/x-rar': lambda f: RarFile(f'{f}').namelist(),
         'application/zip': lambda f: ZipFile(f).namelist(),
     }.get(mime)(filename)
+
+
+def _zip_index(f: str) -> Dict[str, Any]:
+    with ZipFile(f) as archive:
+        infos = archive.infolist()
+
+    return {
+        'members': [i.filename for i in infos],
+        'sizes': {i.filename: i.file_size for i in infos},
+        'methods': sorted({compressor_names.get(i.compress_type, str(i.compress_type)) for i in infos}),
+        'solid': False,
+    }
+
+
+def _rar_index(f: str) -> Dict[str, Any]:
+    infos = RarFile(f'{f}').infolist()
+    return {
+        'members': [i.filename for i in infos],
+        'sizes': {i.filename: i.file_size for i in infos},
+        # unrar does not expose compression method of members
+        'methods': ['rar'],
+        'solid': None,
+    }
+
+
+def _7zip_index(f: str) -> Dict[str, Any]:
+    with SevenZipFile(f) as archive:
+        infos = archive.list()
+        info = archive.archiveinfo()
+
+    return {
+        'members': [i.filename for i in infos],
+        'sizes': {i.filename: i.uncompressed for i in infos},
+        'methods': sorted(info.method_names),
+        'solid': info.solid,
+    }
+
+
+def read_archive_index(filename: str, mime: str = None) -> Dict[str, Any]:
+    """Read type & content of an archive at once, see `archive_index` for a cached version
+
+    Argument(s):
+    * filename -- File path of the archive as str
+
+    Keyword argument(s):
+    * mime -- Set a MIME type instead of determining it with `get_mime_from_file`
+
+    Return a dict with:
+    * mime -- MIME type of the archive
+    * members -- List of member paths, as listed by `list_archive_content`
+    * sizes -- Dict of member path: uncompressed size
+    * methods -- Sorted list of compression methods used in the archive
+    * solid -- True if members are compressed together (selective extraction still decompresses
+      previous members), None if unknown
+    """
+    mime = mime or get_mime_from_file(filename)
+    index = {
+        'application/x-7z-compressed': _7zip_index,
+        'application/x-rar': _rar_index,
+        'application/zip': _zip_index,
+    }.get(mime)(filename)
+
+    return {'mime': mime, **index}
+
+
+def archive_index(filename: Path) -> Dict[str, Any]:
+    """Get type & content of an archive, like `read_archive_index`
+
+    Result is cached in `archive_index_dirname` of the archive directory, one small file per
+    archive so indexing a download does not rewrite the others. The archive is only read
+    again when modified (size, modification time or inode changed)
+
+    Argument(s):
+    * filename -- Path object of the archive
+
+    Return a dict, see `read_archive_index`
+    """
+    file = Path(filename)
+    cache = file.parent / archive_index_dirname / f'{file.name}.json'
+    identity = file_identity(file)
+    entry = read_json(cache)
+    if isinstance(entry, dict) and entry.get('identity') == identity and 'index' in entry:
+        return entry['index']
+
+    index = read_archive_index(str(file))
+    try:
+        cache.parent.mkdir(exist_ok=True)
+        write_json(cache, {'identity': identity, 'index': index})
+    except OSError:
+        # Not fatal, the archive is read again next time
+        pass
+
+    return index
+
+
+class ZipStreamError(Exception):
+    "Raised by `stream_zip` when an archive cannot be extracted sequentially"
+    pass
+
+
+_zip_local_header = Struct('<4sHHHHHIIIHH')
+"Local file header of a zip member: signature, version, flags, method, time, date, crc, sizes, name & extra lengths"
+
+_zip_chunk_size: int = 1024 * 1024
+
+
+class _ZipReader:
+    # Sequential reader able to go back in data read too far (end of a deflate stream)
+
+    def __init__(self, reader: BinaryIO) -> None:
+        self._reader = reader
+        self._buffer = b''
+        self._pos = 0
+
+    def read_some(self, size: int) -> bytes:
+        "Read up to `size` bytes, less if data was given back with `unread()`"
+        if self._pos < len(self._buffer):
+            data = self._buffer[self._pos:self._pos + size]
+        else:
+            # Kept so the end of it can be given back
+            data = self._buffer = self._reader.read(size)
+            self._pos = 0
+
+        self._pos += len(data)
+        return data
+
+    def read_exact(self, size: int) -> bytes:
+        data = b''
+        while len(data) < size:
+            chunk = self.read_some(size - len(data))
+            if not chunk:
+                raise ZipStreamError('Unexpected end of archive')
+            data += chunk
+        return data
+
+    def unread(self, size: int) -> None:
+        "Give back the last `size` bytes of the last `read_some()` call"
+        self._pos -= size
+
+
+def _zip64_sizes(extra: bytes, csize: int, usize: int) -> Tuple[int, int, bool]:
+    # Return compressed size, uncompressed size and if the member uses zip64 extensions
+    i = 0
+    while i + 4 <= len(extra):
+        tag, size = unpack_from('<HH', extra, i)
+        if tag == 0x0001:
+            values = list(unpack_from(f'<{size // 8}Q', extra, i + 4))
+            usize = values.pop(0) if usize == 0xFFFFFFFF and values else usize
+            csize = values.pop(0) if csize == 0xFFFFFFFF and values else csize
+            return csize, usize, True
+        i += 4 + size
+
+    return csize, usize, False
+
+
+def _zip_member_name(raw: bytes, flags: int) -> str:
+    name = raw.decode('utf-8' if flags & 0x800 else 'cp437').replace('\\', '/')
+    if name.startswith('/') or '..' in name.split('/') or ':' in name:
+        # zipfile sanitizes these names, let it handle the archive
+        raise ZipStreamError(f'Unsafe member name {name}')
+    return name
+
+
+def _inflate_member(reader: _ZipReader, out: Optional[BinaryIO], csize: Optional[int]) -> int:
+    # Return CRC32 of the inflated data, `csize` is None if only known after data (data descriptor)
+    inflater = decompressobj(-MAX_WBITS)
+    crc = 0
+    while not inflater.eof:
+        chunk = reader.read_some(_zip_chunk_size if csize is None else min(csize, _zip_chunk_size))
+        if not chunk:
+            raise ZipStreamError('Unexpected end of archive')
+        if csize is not None:
+            csize -= len(chunk)
+
+        data = inflater.decompress(chunk)
+        crc = crc32(data, crc)
+        if out:
+            out.write(data)
+
+    reader.unread(len(inflater.unused_data))
+    return crc
+
+
+def _copy_member(reader: _ZipReader, out: Optional[BinaryIO], size: int) -> int:
+    crc = 0
+    while size > 0:
+        data = reader.read_exact(min(size, _zip_chunk_size))
+        size -= len(data)
+        crc = crc32(data, crc)
+        if out:
+            out.write(data)
+    return crc
+
+
+def _stream_zip_member(
+    reader: _ZipReader, path: Path, mapping: Optional[Callable[[str], Optional[str]]]
+) -> Optional[str]:
+    # Extract the member following its signature, return its path relative to `path` if a file was written
+    _, _, flags, method, _, _, crc, csize, usize, nlen, xlen = _zip_local_header.unpack(
+        b'PK\x03\x04' + reader.read_exact(_zip_local_header.size - 4)
+    )
+    name = _zip_member_name(reader.read_exact(nlen), flags)
+    csize, usize, zip64 = _zip64_sizes(reader.read_exact(xlen), csize, usize)
+    descriptor = bool(flags & 0x08)
+
+    if flags & 0x01:
+        raise ZipStreamError(f'{name} is encrypted')
+    if method not in (0, 8) or (method == 0 and descriptor):
+        # Size of stored data is only known after it with a data descriptor
+        raise ZipStreamError(f'{name} cannot be read sequentially (method {method})')
+
+    target = mapping(name) if mapping else name
+    dst = path / target if target and not name.endswith('/') else None
+    if dst:
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        unlink_before_write(dst)
+    elif target:
+        (path / target).mkdir(parents=True, exist_ok=True)
+
+    with (open(dst, 'wb') if dst else nullcontext()) as out:
+        computed = _inflate_member(reader, out, None if descriptor else csize) if method == 8 \
+            else _copy_member(reader, out, csize)
+
+    if descriptor:
+        head = reader.read_exact(4)
+        crc = unpack_from('<I', reader.read_exact(4) if head == b'PK\x07\x08' else head)[0]
+        reader.read_exact(16 if zip64 else 8)
+
+    if computed != crc:
+        raise ZipStreamError(f'CRC mismatch for {name}')
+
+    return target if dst else None
+
+
+def stream_zip(reader: BinaryIO, path: Path, mapping: Callable[[str], Optional[str]] = None) -> List[str]:
+    """Extract a zip archive while reading it, relying only on local file headers
+    (ie: from an HTTP response, without writing the archive first)
+
+    Reading stops after the signature of the central directory, remaining data is not consumed
+
+    Argument(s):
+    * reader -- Binary file-like object, only its `read(size)` method is used
+    * path -- Path object of the directory where to extract the archive
+
+    Keyword argument(s):
+    * mapping -- Called with each member path, return its path relative to `path`
+      or None to skip it. All members are written at the same path if not set
+
+    Raise `ZipStreamError` if the archive cannot be extracted sequentially (ie: not a zip,
+    encrypted or unsupported compression), files extracted until then are left in place
+
+    Return written files, relative to `path`
+    """
+    zip_reader = _ZipReader(reader)
+    written = []
+    while (signature := zip_reader.read_exact(4)) == b'PK\x03\x04':
+        name = _stream_zip_member(zip_reader, Path(path), mapping)
+        if name:
+            written.append(name)
+
+    # Central directory or end of central directory (empty archive)
+    if signature not in (b'PK\x01\x02', b'PK\x05\x06'):
+        raise ZipStreamError('Not a zip archive or unexpected data')
+
+    return written
@@ -0,0 +1,132 @@
+"""
+Persistent caches stored as JSON files
+
+Sidecar files are named with `sidecar_prefix` so commands cleaning a directory can ignore them
+"""
+
+from json import JSONDecodeError, dumps, loads
+from os import replace, unlink
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from typing import Any, Dict, Iterator, Optional
+
+sidecar_prefix: str = '.gamma-launcher-'
+"Prefix of every cache file written by gamma-launcher"
+
+
+def file_identity(file: Path) -> Dict[str, int]:
+    """Get identity of a file, used to know if a cached information is still valid
+
+    Argument(s):
+    * file -- Path object of the file
+
+    Return a dict with size, modification time (ns) and inode of the file
+    """
+    st = file.stat()
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'inode': st.st_ino}
+
+
+def read_json(path: Path) -> Any:
+    """Read a JSON file, like one written by `write_json`
+
+    Argument(s):
+    * path -- Path object of the JSON file
+
+    Return None if the file does not exist or is not valid JSON
+    """
+    try:
+        return loads(path.read_text())
+    except (FileNotFoundError, JSONDecodeError):
+        return None
+
+
+def write_json(path: Path, data: Any, indent: Optional[int] = None, sort_keys: bool = False) -> None:
+    """Write a JSON file atomically: data goes to a temporary file renamed over `path`,
+    so an interrupted write never leaves a truncated file and concurrent writers do not mix their data
+
+    Argument(s):
+    * path -- Path object of the JSON file, its directory must exist
+    * data -- JSON serializable object
+
+    Keyword argument(s):
+    * indent -- Same as `json.dumps`
+    * sort_keys -- Same as `json.dumps`
+    """
+    with NamedTemporaryFile('w', dir=path.parent, prefix=f'{path.name}.', suffix='.tmp', delete=False) as tmp:
+        try:
+            tmp.write(dumps(data, indent=indent, sort_keys=sort_keys))
+        except BaseException:
+            tmp.close()
+            unlink(tmp.name)
+            raise
+
+    try:
+        replace(tmp.name, path)
+    except OSError:
+        unlink(tmp.name)
+        raise
+
+
+class JsonCache:
+    """Thread-safe dictionary persisted in a JSON file
+
+    Use `JsonCache.open()` to share the same instance between threads
+
+    Argument(s):
+    * path -- Path object of the JSON file
+    """
+
+    _instances: Dict[Path, 'JsonCache'] = {}
+    _instances_lock = Lock()
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._lock = Lock()
+        self._data: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def open(cls, path: Path) -> 'JsonCache':
+        "Return the cache instance for `path`, creating it if needed"
+        path = path.absolute()
+        with cls._instances_lock:
+            if path not in cls._instances:
+                cls._instances[path] = cls(path)
+            return cls._instances[path]
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def _load(self) -> Dict[str, Any]:
+        if self._data is None:
+            self._data = read_json(self._path) or {}
+
+        return self._data
+
+    def _save(self) -> None:
+        try:
+            write_json(self._path, self._data, indent=1, sort_keys=True)
+        except OSError:
+            # A cache is only an optimisation, a read-only directory should not be fatal
+            pass
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._load().get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._load()[key] = value
+            self._save()
+
+    def pop(self, key: str) -> Any:
+        with self._lock:
+            value = self._load().pop(key, None)
+            if value is not None:
+                self._save()
+            return value
+
+    def keys(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._load().keys()))
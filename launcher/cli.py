@@ -15,6 +15,7 @@ from launcher.commands import (
 )
 
 from argparse import ArgumentParser, Namespace, SUPPRESS
+from multiprocessing import freeze_support
 from os import getenv
 from platformdirs import user_config_path
 from sys import argv
@@ -95,6 +96,9 @@ def save_configuration(args: Namespace) -> None:
 
 def main():
     "CLI entrypoint function"
+    # Required by process pools in pyinstaller executables
+    freeze_support()
+
     _config_file_path.parent.mkdir(parents=True, exist_ok=True)
     _config_file_path.touch(exist_ok=True)
 
@@ -1,16 +1,36 @@
 import sys
 
 from argparse import SUPPRESS
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from os import cpu_count
 from pathlib import Path
 from os.path import sep
-from typing import Iterator, Tuple
+from tqdm import tqdm
+from typing import Iterator, List, Optional, Tuple
 
-from launcher.common import anomaly_arg, gamma_arg
-from launcher.hash import check_hash
+from launcher.archive import archive_index_dirname
+from launcher.cache import sidecar_prefix
+from launcher.common import anomaly_arg, gamma_arg, moddb_cache_arg
+from launcher.hash import aggregated_progress, compute_hash
 from launcher.mods import read_mod_maker
+from launcher.mods.downloader import ModDBDownloader
 from launcher.exceptions import HashError, ModDBDownloadError
 
 
+def _check_anomaly_batch(batch: List[Tuple[Path, str, int]]) -> Tuple[List[str], int]:
+    # Executed in a worker process, keep it at module level to be picklable
+    errors = []
+    for file, hash, _ in batch:
+        try:
+            if compute_hash(file, display=False) != hash:
+                errors.append(str(file))
+        except FileNotFoundError:
+            errors.append(f"{file} (missing)")
+
+    return errors, sum(i[2] for i in batch)
+
+
 class CheckAnomaly:
     """Verify Anomaly files based on *\\<path/to/anomaly\\>/tools/checksums.md5*
 
@@ -18,13 +38,26 @@ class CheckAnomaly:
     """
 
     arguments: dict = {
-        **anomaly_arg
+        **anomaly_arg,
+        "--check-jobs": {
+            "help": "Number of processes used to hash Anomaly files (default: CPU count)",
+            "type": int,
+            "dest": "check_jobs",
+        },
+        "--fail-fast": {
+            "help": "Stop at the first invalid file",
+            "action": "store_true",
+            "dest": "fail_fast",
+        },
     }
 
     name: str = "check-anomaly"
 
     help: str = "Check Anomaly installation"
 
+    batch_size: int = 64 * 1024 * 1024
+    "Files are grouped in batches up to this size (in bytes) before being sent to a worker process"
+
     @staticmethod
     def _read_checksums(anomaly: Path) -> Iterator[Tuple[Path, str]]:
         checksums = anomaly / "tools" / "checksums.md5"
@@ -35,12 +68,45 @@ class CheckAnomaly:
             file = anomaly / file.lstrip("*").replace("\\", sep)
             yield file, hash
 
+    def _batches(self, anomaly: Path) -> List[List[Tuple[Path, str, int]]]:
+        files = sorted(
+            ((file, hash, file.stat().st_size if file.exists() else 0) for file, hash in self._read_checksums(anomaly)),
+            key=lambda x: x[2], reverse=True
+        )
+
+        batches, batch, batch_size = [], [], 0
+        for i in files:
+            if batch and batch_size + i[2] > self.batch_size:
+                batches.append(batch)
+                batch, batch_size = [], 0
+            batch.append(i)
+            batch_size += i[2]
+
+        return batches + ([batch] if batch else [])
+
     def run(self, args) -> None:
         anomaly = Path(args.anomaly).expanduser()
+        batches = self._batches(anomaly)
         errors = []
-        for file, hash in self._read_checksums(anomaly):
-            if not check_hash(file, hash, desc=f"Checking Anomaly file: {file}..."):
-                errors.append(str(file))
+
+        # Can be called from other commands without check-anomaly arguments
+        jobs = getattr(args, 'check_jobs', None) or cpu_count() or 1
+        fail_fast = getattr(args, 'fail_fast', False)
+
+        with ProcessPoolExecutor(max_workers=max(jobs, 1)) as executor, tqdm(
+            desc="Checking Anomaly files", unit="iB", unit_scale=True, unit_divisor=1024,
+            total=sum(i[2] for batch in batches for i in batch), ascii=True
+        ) as progress:
+            pending = {executor.submit(_check_anomaly_batch, batch) for batch in batches}
+            while pending and not (errors and fail_fast):
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch_errors, size = future.result()
+                    errors += batch_errors
+                    progress.update(size)
+
+            for future in pending:
+                future.cancel()
 
         if errors:
             err_str = "\n".join(errors)
@@ -68,6 +134,12 @@ class CheckMD5:
             "dest": "update_cache",
             "action": "store_true"
         },
+        "--jobs": {
+            "help": "Number of archives checked in parallel, progress is aggregated if above 1 (default: 1)",
+            "type": int,
+            "default": 1,
+        },
+        **moddb_cache_arg,
     }
 
     name: str = "check-md5"
@@ -87,14 +159,37 @@ class CheckMD5:
         files_in_use.add(dl_dir / "modorganizer-Mod.Organizer-2.5.2.7z")
 
         for archive in dl_dir.iterdir():
-            if archive.name.endswith(".git") or archive.absolute() in files_in_use:
+            if archive.name.endswith(".git") or archive.name.startswith(sidecar_prefix) or \
+               archive.absolute() in files_in_use:
                 continue
 
             print(f"[+] Purging {archive}...")
             archive.unlink()
+            (dl_dir / archive_index_dirname / f'{archive.name}.json').unlink(missing_ok=True)
+
+    @staticmethod
+    def _check(downloader, dl_dir: Path, update_cache: bool) -> Optional[str]:
+        try:
+            downloader.check(dl_dir, update_cache)
+        except (HashError, ModDBDownloadError) as e:
+            return str(e)
+
+        return None
+
+    def _check_all(self, downloaders, dl_dir: Path, update_cache: bool, jobs: int) -> Iterator[Optional[str]]:
+        jobs = max(jobs, 1)
+        with ThreadPoolExecutor(max_workers=jobs) as executor, (
+            aggregated_progress("Checking archives") if jobs > 1 else nullcontext()
+        ) as progress:
+            for i, error in enumerate(executor.map(
+                lambda x: self._check(x, dl_dir, update_cache), downloaders
+            ), start=1):
+                if progress:
+                    progress.set_postfix_str(f"{i}/{len(downloaders)} archives")
+                yield error
 
     def run(self, args) -> None:
-        errors = []
+        ModDBDownloader.metadata_ttl = int(args.metadata_ttl * 3600)
 
         gamma = Path(args.gamma).expanduser()
         dl_dir = gamma / "downloads"
@@ -111,11 +206,7 @@ class CheckMD5:
               'and this commands will freeze & spin a CPU to 100% if this is the case.'
         )
         print('-- Starting MD5 Check')
-        for i in downloaders:
-            try:
-                i.check(dl_dir, args.update_cache)
-            except (HashError, ModDBDownloadError) as e:
-                errors.append(str(e))
+        errors = list(filter(None, self._check_all(downloaders, dl_dir, args.update_cache, args.jobs)))
 
         if args.remove_unused:
             self._purge_unused_files(dl_dir, downloaders)
@@ -1,13 +1,22 @@
+from contextlib import nullcontext
 from pathlib import Path
 from platform import system
-from shutil import copy2, copytree, disk_usage
+from shutil import copy2, disk_usage, rmtree
 from tempfile import TemporaryDirectory
-from typing import Dict
+from typing import Dict, List, Tuple
 
+from launcher import archive
 from launcher.commands import CheckAnomaly
-from launcher.common import anomaly_arg, gamma_arg, cache_dir_arg
+from launcher.common import anomaly_arg, gamma_arg, cache_dir_arg, link_mode_arg, moddb_cache_arg, \
+    sevenzip_backend_arg
+from launcher.fileops import break_link, link_tree, staging_prefix
 
 from launcher.mods import BaseArchive, GithubArchive, GitResource, ModDBArchive, read_mod_maker
+from launcher.mods.downloader import DefaultDownloader, ModDBDownloader
+from launcher.mods.installer import BaseInstaller
+from launcher.mods.manifest import InstallManifest, install_manifest_dirname
+from launcher.mods.pipeline import InstallPipeline
+from launcher.mods.scheduler import DownloadScheduler, default_host_limits
 
 
 guide_url: str = "https://github.com/DravenusRex/stalker-gamma-linux-guide"
@@ -45,6 +54,14 @@ class AnomalyInstall:
             "action": "store_true",
             "dest": "anomaly_purge_cache"
         },
+        "--download-segments": {
+            "help": "Download large files with N parallel connections if the server allows it (default: 1)",
+            "type": int,
+            "dest": "download_segments",
+            "default": 1,
+        },
+        **moddb_cache_arg,
+        **sevenzip_backend_arg,
         **cache_dir_arg,
     }
 
@@ -57,6 +74,10 @@ class AnomalyInstall:
         self._cache_dir = None
 
     def run(self, args) -> None:
+        DefaultDownloader.segments = args.download_segments
+        ModDBDownloader.metadata_ttl = int(args.metadata_ttl * 3600)
+        archive.sevenzip_backend = args.sevenzip_backend
+
         self._anomaly_dir = Path(args.anomaly).expanduser()
         self._anomaly_dir.mkdir(parents=True, exist_ok=True)
 
@@ -145,6 +166,14 @@ class GammaSetup:
         (self._gamma_dir / "mods").mkdir(exist_ok=True)
 
 
+def _parse_host_limit(value: str) -> Tuple[str, int]:
+    host, _, limit = value.partition('=')
+    if not host or not limit.isdigit():
+        raise ValueError(f'Invalid host limit: {value}, expected HOST=N')
+
+    return host, int(limit)
+
+
 def _create_full_install_args() -> Dict:
     arguments: dict = {}
     arguments.update(AnomalyInstall.arguments)
@@ -176,6 +205,38 @@ def _create_full_install_args() -> Dict:
             "help": "Do not overwrite user configuration when patching Anomaly directory",
             "action": "store_true",
         },
+        "--download-jobs": {
+            "help": "Number of mods downloaded in parallel (default: 4)",
+            "type": int,
+            "dest": "download_jobs",
+            "default": 4,
+        },
+        "--download-host-limit": {
+            "help": "Maximum parallel downloads for a domain as HOST=N, can be repeated "
+                    f"(default: {' '.join(f'{h}={n}' for h, n in default_host_limits.items())})",
+            "type": _parse_host_limit,
+            "action": "append",
+            "dest": "download_host_limits",
+            "default": [],
+        },
+        "--extract-ahead": {
+            "help": "Number of mods extracted in advance while installing previous ones (default: 2)",
+            "type": int,
+            "dest": "extract_ahead",
+            "default": 2,
+        },
+        "--extract-jobs": {
+            "help": "Number of archives extracted in parallel by worker processes (default: 1)",
+            "type": int,
+            "dest": "extract_jobs",
+            "default": 1,
+        },
+        **link_mode_arg,
+        "--reinstall-all": {
+            "help": "Install every mod again, even if already installed with the same archive and definition",
+            "action": "store_true",
+            "dest": "reinstall_all",
+        },
     })
 
     return arguments
@@ -188,7 +249,8 @@ def _replace_string_in_file(file_path: Path, target_string: str, replacement_str
     # Replace the target string with the replacement string
     modified_contents = file_contents.replace(target_string, replacement_string)
 
-    # Write the modified content back to the file
+    # Write the modified content back to the file, without modifying a linked source
+    break_link(file_path)
     file_path.write_text(modified_contents)
 
 
@@ -208,12 +270,14 @@ class FullInstall:
         self._mod_dir = None
         self._grok_mod_dir = None
         self._repo = None
+        self._link_mode = 'copy'
 
     def _update_gamma_definition(self, *args) -> None:
         print('[+] Updating G.A.M.M.A. definition')
 
         rev_file = self._grok_mod_dir / 'revision.txt'
         g = GithubArchive(f'https://github.com/{self._repo}')
+        g.downloader.depth = 1
         g.download(self._dl_dir, use_cached=True)
 
         try:
@@ -237,9 +301,9 @@ class FullInstall:
         rev_file = self._grok_mod_dir / 'revision.txt'
         print(f'[+] Setting custom G.A.M.M.A. definition to: {rev}')
 
+        # Archive is downloaded again each time, no need to write it
         g = GithubArchive(f'https://github.com/{self._repo}/archive/{rev}.zip')
-        g.download(self._dl_dir)
-        g.extract(self._grok_mod_dir)
+        g.download_extract(self._dl_dir, self._grok_mod_dir)
 
         rev_file.write_text(f'Custom: {rev}\n')
 
@@ -250,9 +314,9 @@ class FullInstall:
         if user_config.is_file():
             copy2(user_config, saved_config)
 
-        copytree(
+        link_tree(
             self._grok_mod_dir / 'G.A.M.M.A' / 'modpack_patches',
-            self._anomaly_dir, dirs_exist_ok=True
+            self._anomaly_dir, self._link_mode, copy_only=('appdata',)
         )
 
         if preserve_user_config:
@@ -260,31 +324,85 @@ class FullInstall:
         else:
             _replace_string_in_file(user_config, "rs_screenmode fullscreen", "rs_screenmode borderless")
 
-    def _install_mods(self) -> None:
-        mods = read_mod_maker(self._grok_mod_dir / 'G.A.M.M.A' / 'modpack_data')
-        mods_len = len(mods)
-        for i, mod in enumerate(mods):
-            print(f'[+] Processing mod {mod.info.title or mod.info.name} ({i}/{mods_len})')
-            if mod.info.name == "164- Hunger Thirst Sleep UI 0.71 - xcvb":
-                continue
-            mod.download(self._dl_dir, use_cached=True)
-            mod.install(self._mod_dir)
+    def _remove_dropped_mods(self, manifest: InstallManifest, mods: List[BaseInstaller]) -> None:
+        for name in set(manifest.names()) - {i.info.name for i in mods}:
+            print(f'[-] Removing files of dropped mod {name}')
+            manifest.uninstall(name, self._mod_dir)
+
+    def _install_mod(self, manifest: InstallManifest, mod: BaseInstaller) -> None:
+        inputs = mod.fingerprint()
+        previous = (manifest.get(mod.info.name) or {}).get('files', [])
+
+        mod.install(self._mod_dir)
+        if not inputs:
+            return
+
+        # Remove files of the previous version not provided anymore
+        for i in set(previous) - set(mod.installed_files):
+            (self._mod_dir / i).unlink(missing_ok=True)
+        manifest.set(mod.info.name, inputs, mod.installed_files)
+
+    def _install_mods(
+        self, jobs: int, host_limits: Dict[str, int], extract_ahead: int, reinstall_all: bool = False,
+        extract_jobs: int = 1
+    ) -> None:
+        mods = list(filter(
+            lambda x: x.info.name != "164- Hunger Thirst Sleep UI 0.71 - xcvb",
+            read_mod_maker(self._grok_mod_dir / 'G.A.M.M.A' / 'modpack_data')
+        ))
+        manifest = InstallManifest(self._gamma_dir / install_manifest_dirname)
+        self._remove_dropped_mods(manifest, mods)
+
+        # Leftovers of an interrupted installation
+        for i in self._mod_dir.glob(f'{staging_prefix}*'):
+            rmtree(i, ignore_errors=True)
+
+        def needs_install(mod: BaseInstaller) -> bool:
+            return reinstall_all or not manifest.is_installed(mod.info.name, mod.fingerprint(), self._mod_dir)
+
+        with DownloadScheduler(self._dl_dir, jobs, {**default_host_limits, **host_limits}) as scheduler, \
+             (archive.extract_pool(extract_jobs) if extract_jobs > 1 else nullcontext()) as pool:
+            pipeline = InstallPipeline(
+                scheduler, download_ahead=2 * jobs, extract_ahead=extract_ahead,
+                needs_install=needs_install, install_dir=self._mod_dir, extract_jobs=extract_jobs
+            )
+            # Archives of mods staged at once are decompressed by worker processes
+            DefaultDownloader.extract_executor = pool
+            try:
+                self._run_pipeline(pipeline, manifest, mods)
+            finally:
+                DefaultDownloader.extract_executor = None
+
+    def _run_pipeline(self, pipeline: InstallPipeline, manifest: InstallManifest, mods: List[BaseInstaller]) -> None:
+        for i, (mod, install) in enumerate(pipeline.run(mods)):
+            status = pipeline.status
+            print(
+                f'[{"+" if install else "*"}] {"Processing" if install else "Up to date"} '
+                f'mod {mod.info.title or mod.info.name} ({i}/{len(mods)}) '
+                f'[downloads: {status["downloads"]}, extracted: {status["extracted"]}]'
+            )
+            if install:
+                self._install_mod(manifest, mod)
 
     def _install_git_resources(self) -> None:
         print('[+] Installing Git Resources')
 
-        resource = GitResource('https://github.com/Grokitach/gamma_large_files_v2', False)
+        # Only the last revision is needed, every file of it is installed
+        resource = GitResource('https://github.com/Grokitach/gamma_large_files_v2', False, depth=1)
         resource.download(self._dl_dir)
         resource.install(self._mod_dir)
 
-        resource = GitResource('https://github.com/Grokitach/teivaz_anomaly_gunslinger', True)
+        # Only gamedata folders are installed, other files are not downloaded
+        resource = GitResource(
+            'https://github.com/Grokitach/teivaz_anomaly_gunslinger', True, depth=1, blob_filter='blob:none'
+        )
         resource.download(self._dl_dir)
         resource.install(self._mod_dir / '312- Gunslinger Guns for Anomaly - Teivazcz & Gunslinger Team')
 
     def _copy_gamma_modpack(self) -> None:
         path = self._grok_mod_dir / 'G.A.M.M.A' / 'modpack_addons'
         print(f'[+] Copying G.A.M.M.A mods in from "{path}" to "{self._mod_dir}"')
-        copytree(path, self._mod_dir, dirs_exist_ok=True)
+        link_tree(path, self._mod_dir, self._link_mode)
 
     def _install_modorganizer_profile(self) -> None:
         p_path = self._gamma_dir / 'profiles' / 'G.A.M.M.A'
@@ -303,7 +421,9 @@ AutomaticArchiveInvalidation=false
 """)
 
     def run(self, args):
-        check_tmp_free_space(6)
+        DefaultDownloader.segments = args.download_segments
+        ModDBDownloader.metadata_ttl = int(args.metadata_ttl * 3600)
+        archive.sevenzip_backend = args.sevenzip_backend
 
         # Init paths
         self._anomaly_dir = Path(args.anomaly).expanduser()
@@ -324,13 +444,17 @@ AutomaticArchiveInvalidation=false
 
         # Start installing
         self._repo = args.custom_repo
+        self._link_mode = args.link_mode
 
         if args.update_def:
             (self._update_gamma_definition if not args.custom_def else self._set_custom_gamma_def)(args.custom_def)
         if args.anomaly_patch:
             self._patch_anomaly(args.preserve_user_config)
 
-        self._install_mods()
+        self._install_mods(
+            args.download_jobs, dict(args.download_host_limits), args.extract_ahead, args.reinstall_all,
+            args.extract_jobs
+        )
         self._install_git_resources()
         self._install_modorganizer_profile()
         self._copy_gamma_modpack()
@@ -1,8 +1,12 @@
 from pathlib import Path
-from shutil import copytree
-from typing import Iterator
+from typing import Any, Dict, Iterator, Optional
 
-from launcher.common import anomaly_arg, gamma_arg
+from launcher.cache import read_json, sidecar_prefix, write_json
+from launcher.common import anomaly_arg, gamma_arg, link_mode_arg
+from launcher.overlay import Overlay
+
+usvfs_state_filename: str = f'{sidecar_prefix}usvfs.json'
+"Name of the file describing the content of the final directory, used to update it incrementally"
 
 
 class Usvfs:
@@ -11,10 +15,16 @@ class Usvfs:
         **anomaly_arg,
         **gamma_arg,
         "--final": {
-            "help": "Path to final install directory",
+            "help": "Path to final install directory, updated with changes only if created by this command",
             "required": True,
             "type": str
         },
+        "--conflict-report": {
+            "help": "Write the list of files provided by more than one mod, and which one wins, to a file",
+            "type": str,
+            "dest": "conflict_report",
+        },
+        **link_mode_arg,
     }
 
     name: str = "usvfs-workaround"
@@ -30,23 +40,50 @@ class Usvfs:
         ]
         return reversed(mods)
 
+    def _resolve(self, anomaly_dir: Path, gamma_dir: Path) -> Overlay:
+        overlay = Overlay()
+        overlay.add_layer('Anomaly', anomaly_dir)
+
+        for mod in self._read_modlist(gamma_dir / 'profiles' / 'G.A.M.M.A' / 'modlist.txt'):
+            try:
+                overlay.add_layer(mod, gamma_dir / 'mods' / mod)
+            except FileNotFoundError as err:
+                print(f"  {mod} --> Failed: {err}")
+
+        # Anomaly binaries always win
+        overlay.add_layer('Anomaly bin', anomaly_dir / 'bin', 'bin/')
+        return overlay
+
+    @staticmethod
+    def _read_state(install_dir: Path) -> Optional[Dict[str, Dict[str, Any]]]:
+        return read_json(install_dir / usvfs_state_filename)
+
+    @staticmethod
+    def _write_state(install_dir: Path, state: Dict[str, Dict[str, Any]]) -> None:
+        write_json(install_dir / usvfs_state_filename, state)
+
     def run(self, args) -> None:
         gamma_dir = Path(args.gamma).expanduser()
         anomaly_dir = Path(args.anomaly).expanduser()
         install_dir = Path(args.final).expanduser()
 
-        install_dir.mkdir(parents=True)
+        previous = self._read_state(install_dir)
+        if previous is None:
+            # Not built by this command, refuse to write in it
+            install_dir.mkdir(parents=True)
+        else:
+            print(f'Updating existing install directory {install_dir}...')
 
-        print('Copying Anomaly dir to install directory...')
-        copytree(anomaly_dir, install_dir, dirs_exist_ok=True)
+        print('Resolving Anomaly dir and mods...')
+        overlay = self._resolve(anomaly_dir, gamma_dir)
+        print(f'  {len(overlay.files)} files, {len(overlay.conflicts)} overridden by a mod with higher priority')
 
-        print('Applying mods...')
-        for mod in self._read_modlist(gamma_dir / 'profiles' / 'G.A.M.M.A' / 'modlist.txt'):
-            print(f"  Installing {mod}")
-            try:
-                copytree(gamma_dir / 'mods' / mod, install_dir, dirs_exist_ok=True)
-            except FileNotFoundError as err:
-                print(f"    --> Failed: {err}")
+        if args.conflict_report:
+            Path(args.conflict_report).expanduser().write_text(overlay.conflict_report() + '\n')
+            print(f'  Conflict report written to {args.conflict_report}')
 
-        print('Reapplying Anomaly binary dir to install directory')
-        copytree(anomaly_dir / 'bin', install_dir / 'bin', dirs_exist_ok=True)
+        print('Writing install directory...')
+        # appdata is written by the game (settings, saves, shaders cache), never share it with Anomaly dir
+        state, written, removed = overlay.materialize(install_dir, args.link_mode, ('appdata',), previous)
+        self._write_state(install_dir, state)
+        print(f'  {written} files written, {removed} removed, {len(state) - written} unchanged')
@@ -1,5 +1,9 @@
+from platform import system
 from typing import Tuple
 
+from launcher.archive import sevenzip_backends
+from launcher.fileops import link_modes
+
 folder_to_install: Tuple[str] = ('appdata', 'db', 'gamedata')
 "Folder to lookout for GAMMA mods installation"
 
@@ -29,3 +33,43 @@ cache_dir_arg = {
     }
 }
 "Common arg(s) for cache directory function"
+
+sevenzip_backend_arg = {
+    "--7z-backend": {
+        "help": "Tool used to extract 7z archives, auto uses the first one found in PATH among "
+                f"{', '.join(sevenzip_backends)} (default: auto). Windows always uses 7z",
+        # Windows extracts every archive type with 7z.exe, backends do not apply there
+        "choices": ('auto', *sevenzip_backends) if system() != 'Windows' else ('auto',),
+        "dest": "sevenzip_backend",
+        "default": "auto",
+    }
+}
+"Common arg(s) for commands extracting archives"
+
+link_mode_arg = {
+    "--link-mode": {
+        "help": "How files are put in destination: copy, hardlink (no space used, files modified in place "
+                "are modified at both locations) or reflink (copy-on-write clone on btrfs, xfs...). "
+                "Link modes fall back to copy when not possible (default: copy)",
+        "choices": link_modes,
+        "dest": "link_mode",
+        "default": "copy",
+    }
+}
+"Common arg(s) for commands copying files"
+
+moddb_cache_arg = {
+    "--metadata-ttl": {
+        "help": "Hours during which ModDB metadata (filename, MD5, mirror) are reused from cache (default: 24)",
+        "type": float,
+        "dest": "metadata_ttl",
+        "default": 24,
+    },
+    "--refresh-metadata": {
+        "help": "Request ModDB metadata again even if they are cached",
+        "action": "store_const",
+        "const": 0,
+        "dest": "metadata_ttl",
+    },
+}
+"Common arg(s) for commands requesting ModDB"
@@ -4,3 +4,7 @@ class HashError(Exception):
 
 class ModDBDownloadError(Exception):
     pass
+
+
+class DownloadCancelledError(Exception):
+    pass
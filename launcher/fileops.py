@@ -0,0 +1,164 @@
+"""
+File operations used to install extracted files
+"""
+
+from functools import partial
+from os import link, replace, walk
+from pathlib import Path
+from shutil import copy2, copystat, copytree
+from typing import Callable, Iterable, Tuple
+
+from launcher.cache import sidecar_prefix
+
+try:
+    from fcntl import ioctl
+except ImportError:  # Windows
+    ioctl = None
+
+staging_prefix: str = f'{sidecar_prefix}staging-'
+"Prefix of directories used to extract archives next to their install directory"
+
+link_modes: Tuple[str, ...] = ('copy', 'hardlink', 'reflink')
+"""Ways to put a file in a destination directory:
+* copy -- Regular copy
+* hardlink -- Hard link to the source file, no data written. Both paths share the same content:
+  a file modified in place at one location is modified at the other
+* reflink -- Copy-on-write clone (btrfs, xfs, ...), no data written until one of the files is modified
+
+Both link modes fall back to a copy when not possible (ie: different filesystems)
+"""
+
+_FICLONE: int = 0x40049409
+"Linux ioctl request to clone a file, see ioctl_ficlone(2)"
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    if not ioctl:
+        raise OSError('reflink not supported on this platform')
+
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        ioctl(d.fileno(), _FICLONE, s.fileno())
+    copystat(src, dst)
+
+
+def unlink_before_write(file: Path) -> None:
+    """Remove a file about to be written, so a hard link to another file (ie: usvfs-workaround
+    `--link-mode hardlink`) or a symbolic link is replaced instead of written through
+
+    Argument(s):
+    * file -- Path object of the file, directories are left untouched
+    """
+    if file.is_file() or file.is_symlink():
+        file.unlink()
+
+
+def link_file(src: Path, dst: Path, mode: str = 'copy') -> Path:
+    """Put a file in a destination according to `mode` (see `link_modes`), overwriting destination
+
+    An existing destination is removed first with `unlink_before_write`
+
+    Argument(s):
+    * src -- Path object of the source file
+    * dst -- Path object of the destination file
+
+    Keyword argument(s):
+    * mode -- One of `link_modes`
+
+    Return `dst`, allowing use as `copy_function` of `shutil.copytree`
+    """
+    dst = Path(dst)
+    unlink_before_write(dst)
+
+    try:
+        if mode == 'hardlink':
+            link(src, dst)
+            return dst
+
+        if mode == 'reflink':
+            _reflink(src, dst)
+            return dst
+    except OSError:
+        dst.unlink(missing_ok=True)
+
+    copy2(src, dst)
+    return dst
+
+
+def link_tree(src: Path, dst: Path, mode: str = 'copy', copy_only: Tuple[str, ...] = ()) -> None:
+    """Like `shutil.copytree(src, dst, dirs_exist_ok=True)` with files put in place with `link_file`
+
+    Argument(s):
+    * src -- Path object of the source directory
+    * dst -- Path object of the destination directory
+
+    Keyword argument(s):
+    * mode -- One of `link_modes`
+    * copy_only -- Top level entries of `src` always copied (ie: directories written by the game)
+    """
+    def put(s: str, d: str) -> Path:
+        return link_file(s, d, 'copy' if Path(s).relative_to(src).parts[0] in copy_only else mode)
+
+    copytree(src, dst, copy_function=put if copy_only else partial(link_file, mode=mode), dirs_exist_ok=True)
+
+
+def break_link(file: Path) -> None:
+    """Make sure a file does not share its content with another path (see `link_modes`),
+    needed before modifying it in place
+
+    Argument(s):
+    * file -- Path object of the file
+    """
+    if file.is_file() and file.stat().st_nlink > 1:
+        tmp = file.with_name(f'{file.name}.tmp')
+        copy2(file, tmp)
+        replace(tmp, file)
+
+
+def move_file(src: Path, dst: Path) -> None:
+    """Move a file, overwriting destination
+
+    A rename is used when possible, the file is copied if `src` and `dst`
+    are not on the same filesystem
+
+    Argument(s):
+    * src -- Path object of the file to move
+    * dst -- Path object of the destination file
+    """
+    try:
+        replace(src, dst)
+    except OSError:
+        link_file(src, dst)
+        src.unlink()
+
+
+def move_tree(src: Path, dst: Path, on_file: Callable[[Path], None] = None) -> None:
+    """Merge a directory into another one by moving its files,
+    like `shutil.copytree(src, dst, dirs_exist_ok=True)` without copying data
+
+    Argument(s):
+    * src -- Path object of the directory to move, its files are not there anymore once done
+    * dst -- Path object of the destination directory, created if needed
+
+    Keyword argument(s):
+    * on_file -- Called with the destination path of each moved file
+    """
+    for root, _, files in walk(src):
+        target = dst / Path(root).relative_to(src)
+        target.mkdir(parents=True, exist_ok=True)
+        for f in files:
+            move_file(Path(root) / f, target / f)
+            if on_file:
+                on_file(target / f)
+
+
+def prune_empty_dirs(files: Iterable[Path], root: Path) -> None:
+    """Remove directories left empty after removing files, up to `root` (excluded)
+
+    Argument(s):
+    * files -- Path objects of removed files
+    * root -- Path object of the directory containing `files`
+    """
+    dirs = sorted({p for i in files for p in i.parents if root in p.parents})
+    for d in reversed(dirs):
+        if d.is_dir() and not any(d.iterdir()):
+            d.rmdir()
@@ -1,31 +1,321 @@
-from hashlib import md5
+from contextlib import contextmanager
+from hashlib import md5, new
+from mmap import ACCESS_READ, mmap
+from os import fstat
 from pathlib import Path
+from threading import Lock, local
+from time import monotonic
 from tqdm import tqdm
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from launcher.cache import JsonCache, file_identity, sidecar_prefix
 
-def check_hash(file: Path, checksum: str, desc: str = None) -> bool:
+try:
+    from hashlib import file_digest
+except ImportError:  # Python < 3.11
+    file_digest = None
+
+try:
+    from os import POSIX_FADV_SEQUENTIAL, posix_fadvise
+except ImportError:  # Windows, macOS
+    posix_fadvise = None
+
+try:
+    from mmap import MADV_SEQUENTIAL
+except ImportError:  # Windows
+    MADV_SEQUENTIAL = None
+
+hash_cache_filename: str = f'{sidecar_prefix}hashes.json'
+"Name of the hash cache file created in directories of files hashed with `use_cache=True`"
+
+hash_methods: Tuple[str, ...] = ('readinto', 'mmap', 'file_digest')
+"""Ways to read a file when hashing it (see benchmarks/hash_engine.py):
+* readinto -- Read into a buffer reused for every file of a thread, nothing allocated per chunk
+* mmap -- Map the file in memory, hash functions read the page cache without any copy
+* file_digest -- `hashlib.file_digest` (Python 3.11+), progress is only reported once done.
+  Falls back to readinto for partial or multiple digests, and before Python 3.11
+"""
+
+hash_method: str = 'readinto'
+"Method used by `hash_file`, one of `hash_methods`"
+
+hash_buffer_size: int = 4 * 1024 * 1024
+"Size of the chunks given to hash functions (in bytes)"
+
+progress_interval: float = 0.1
+"Minimum time (in seconds) between two progress updates while hashing a file"
+
+
+class _SharedProgress:
+    "Thread-safe wrapper around a `tqdm` object shared between many files"
+
+    def __init__(self, progress: tqdm) -> None:
+        self._progress = progress
+        self._lock = Lock()
+
+    def add_total(self, size: int) -> None:
+        with self._lock:
+            self._progress.total = (self._progress.total or 0) + size
+            self._progress.refresh()
+
+    def update(self, size: int) -> None:
+        with self._lock:
+            self._progress.update(size)
+
+    def set_postfix_str(self, s: str) -> None:
+        with self._lock:
+            self._progress.set_postfix_str(s)
+
+
+_shared_progress: Optional[_SharedProgress] = None
+
+
+@contextmanager
+def aggregated_progress(desc: str) -> Iterator[_SharedProgress]:
+    """Context manager making `check_hash` report to a single progress bar
+    instead of displaying one bar per file, useful when hashing from multiple threads
+
+    Argument(s):
+    * desc -- Description of the aggregated progress bar
+
+    Yield the shared progress bar object
+    """
+    global _shared_progress
+
+    with tqdm(desc=desc, unit="iB", unit_scale=True, unit_divisor=1024, total=0, ascii=True) as progress:
+        _shared_progress = _SharedProgress(progress)
+        try:
+            yield _shared_progress
+        finally:
+            _shared_progress = None
+
+
+@contextmanager
+def _file_progress(file: Path, desc: str = None, display: bool = True) -> Iterator[tqdm | _SharedProgress]:
+    size = file.stat().st_size
+    shared = _shared_progress
+
+    if shared and display:
+        shared.add_total(size)
+        yield shared
+        return
+
+    with tqdm(
+        desc=desc or f"Calculating hash of {file.name}",
+        unit="iB", unit_scale=True, unit_divisor=1024,
+        total=size, ascii=True, disable=not display
+    ) as progress:
+        yield progress
+
+
+class _ThrottledProgress:
+    "Forward progress updates at most once per `progress_interval`, progress bars are locked on each update"
+
+    def __init__(self, progress: Optional[Any]) -> None:
+        self._progress = progress
+        self._pending = 0
+        self._last = monotonic()
+
+    def update(self, size: int) -> None:
+        self._pending += size
+        now = monotonic()
+        if now - self._last >= progress_interval:
+            self.flush()
+            self._last = now
+
+    def flush(self) -> None:
+        if self._pending and self._progress is not None:
+            self._progress.update(self._pending)
+            self._pending = 0
+
+
+_buffers = local()
+
+
+def _buffer() -> memoryview:
+    buffer = getattr(_buffers, 'buffer', None)
+    if buffer is None or len(buffer) != hash_buffer_size:
+        buffer = _buffers.buffer = memoryview(bytearray(hash_buffer_size))
+    return buffer
+
+
+def _hash_readinto(f: BinaryIO, hashes: List[Any], size: Optional[int], progress: _ThrottledProgress) -> None:
+    buffer = _buffer()
+    while size is None or size > 0:
+        n = f.readinto(buffer if size is None or size >= len(buffer) else buffer[:size])
+        if not n:
+            break
+
+        chunk = buffer[:n]
+        for h in hashes:
+            h.update(chunk)
+        progress.update(n)
+        size = None if size is None else size - n
+
+
+def _hash_mmap(f: BinaryIO, hashes: List[Any], size: Optional[int], progress: _ThrottledProgress) -> None:
+    length = fstat(f.fileno()).st_size
+    length = length if size is None else min(size, length)
+    if not length:
+        # Empty files cannot be mapped
+        return
+
+    with mmap(f.fileno(), length, access=ACCESS_READ) as m:
+        if MADV_SEQUENTIAL is not None:
+            m.madvise(MADV_SEQUENTIAL)
+
+        with memoryview(m) as view:
+            for start in range(0, length, hash_buffer_size):
+                with view[start:start + hash_buffer_size] as chunk:
+                    for h in hashes:
+                        h.update(chunk)
+                    progress.update(len(chunk))
+
+
+def hash_file(file: Path, hashes: Iterable[Any], size: int = None, progress: Any = None) -> None:
+    """Feed the content of a file to hash objects, reading it with `hash_method`
+
+    Argument(s):
+    * file -- File path as Path
+    * hashes -- `hashlib` objects updated with the file content
+
+    Keyword argument(s):
+    * size -- Only hash the first `size` bytes of the file
+    * progress -- Object with an `update(size)` method (ie: `tqdm`), called at most every `progress_interval`
+    """
+    hashes = list(hashes)
+    throttled = _ThrottledProgress(progress)
+
+    with open(file, 'rb', buffering=0) as f:
+        if posix_fadvise:
+            # Larger read-ahead, the file is read once from start to end
+            posix_fadvise(f.fileno(), 0, 0, POSIX_FADV_SEQUENTIAL)
+
+        if hash_method == 'file_digest' and file_digest and size is None and len(hashes) == 1:
+            file_digest(f, lambda: hashes[0])
+            throttled.update(fstat(f.fileno()).st_size)
+        elif hash_method == 'mmap':
+            _hash_mmap(f, hashes, size, throttled)
+        else:
+            _hash_readinto(f, hashes, size, throttled)
+
+    throttled.flush()
+
+
+def _hash_cache(file: Path) -> JsonCache:
+    return JsonCache.open(file.parent / hash_cache_filename)
+
+
+def get_cached_hash(file: Path) -> Optional[str]:
+    """Get MD5 hash of a file from the hash cache of its directory
+
+    Argument(s):
+    * file -- File path as Path
+
+    Return the MD5 hash as str, or None if not cached or file changed since
+    """
+    entry = _hash_cache(file).get(file.name)
+    if not entry or not file.exists():
+        return None
+
+    if {k: entry.get(k) for k in ('size', 'mtime_ns', 'inode')} != file_identity(file):
+        return None
+
+    return entry.get('md5')
+
+
+def set_cached_hash(file: Path, digest: str, extra: Dict[str, str] = None) -> None:
+    """Store MD5 hash of a file in the hash cache of its directory
+
+    Argument(s):
+    * file -- File path as Path
+    * digest -- MD5 hash of the file as str
+
+    Keyword argument(s):
+    * extra -- Other digests of the file to store, as a dict of algorithm name: hex digest
+    """
+    _hash_cache(file).set(file.name, {**(extra or {}), **file_identity(file), 'md5': digest})
+
+
+class StreamHasher:
+    """Compute MD5 (and optionally other digests) of data as it is written,
+    avoiding to read the file again once complete
+
+    Keyword argument(s):
+    * extra -- `hashlib` algorithm names to compute alongside MD5 (ie: 'sha256')
+    """
+
+    def __init__(self, extra: Iterable[str] = ()) -> None:
+        self._hashes = {'md5': md5(), **{i: new(i) for i in extra}}
+
+    def update(self, data: bytes) -> None:
+        for h in self._hashes.values():
+            h.update(data)
+
+    def update_from_file(self, file: Path, size: int) -> None:
+        "Feed the first `size` bytes of `file`, used when appending to an existing file"
+        hash_file(file, self._hashes.values(), size)
+
+    @property
+    def md5(self) -> str:
+        return self._hashes['md5'].hexdigest()
+
+    def store(self, file: Path) -> None:
+        "Record computed digests in the hash cache, see `set_cached_hash`"
+        set_cached_hash(file, self.md5, {k: v.hexdigest() for k, v in self._hashes.items() if k != 'md5'})
+
+
+def compute_hash(file: Path, desc: str = None, display: bool = True) -> str:
     """Compute MD5 hash of a file and display progress with `tqdm`
 
     Argument(s):
-    * file -- File path as Path or str to check
+    * file -- File path as Path
+
+    Keyword argument(s):
+    * desc -- Custom description for `tqdm`
+    * display -- Set to False to hash without any progress report
+
+    Return the MD5 hash as hex str
+    """
+    hash = md5()
+    with _file_progress(file, desc, display) as progress:
+        hash_file(file, [hash], progress=progress)
+
+    return hash.hexdigest()
+
+
+def get_hash(file: Path, desc: str = None) -> str:
+    """Get MD5 hash of a file from the hash cache of its directory,
+    computing and storing it there if needed
+
+    Argument(s):
+    * file -- File path as Path
+
+    Keyword argument(s):
+    * desc -- Custom description for `tqdm`
+
+    Return the MD5 hash as hex str
+    """
+    digest = get_cached_hash(file)
+    if not digest:
+        digest = compute_hash(file, desc)
+        set_cached_hash(file, digest)
+
+    return digest
+
+
+def check_hash(file: Path, checksum: str, desc: str = None, use_cache: bool = False) -> bool:
+    """Compute MD5 hash of a file and display progress with `tqdm`
+
+    Argument(s):
+    * file -- File path as Path to check
     * checksum -- Known checksum of the file
 
     Keyword argument(s):
     * desc -- Custom description for `tqdm`
+    * use_cache -- Look for the hash in the cache of the file directory first and
+      store it there once computed (see `hash_cache_filename`)
 
     Return True if computed checksum and checksum match
     """
-    hash = md5()
-    with open(file, 'rb') as f, tqdm(
-        desc=desc or f"Calculating hash of {file.name}",
-        unit="iB", unit_scale=True, unit_divisor=1024,
-        total=file.stat().st_size, ascii=True
-    ) as progress:
-        while True:
-            s = f.read(1024*1024)
-            if not s:
-                break
-            hash.update(s)
-            progress.update(len(s))
-
-    return hash.hexdigest() == checksum
+    return (get_hash(file, desc) if use_cache else compute_hash(file, desc)) == checksum
@@ -45,8 +45,8 @@ class ModSeparator(SeparatorInstaller):
 
 class GitResource(GitResourceInstaller):
 
-    def __init__(self, url: str, gamedata: bool = False) -> None:
-        super().__init__(ModInfo({'url': url}), gamedata)
+    def __init__(self, url: str, gamedata: bool = False, depth: int = None, blob_filter: str = None) -> None:
+        super().__init__(ModInfo({'url': url}), gamedata, depth, blob_filter)
 
 
 def _parse_modpack_maker_line(line: str) -> ModInfo:
@@ -1,17 +1,26 @@
 ""
 from cloudscraper import create_scraper
+from concurrent.futures import Executor
+from contextlib import closing, nullcontext
 from os.path import basename
 from pathlib import Path
 from re import compile
-from requests.exceptions import ConnectionError
-from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_fixed
+from requests import Response
+from requests.exceptions import ChunkedEncodingError, ConnectionError, RequestException
+from tempfile import TemporaryDirectory
+from threading import Event
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 from tqdm import tqdm
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
 from urllib.parse import urlparse
 
 from launcher import __version__
-from launcher.exceptions import HashError
-from launcher.hash import check_hash
-from launcher.archive import extract_archive
+from launcher.cache import JsonCache, sidecar_prefix
+from launcher.exceptions import DownloadCancelledError, HashError
+from launcher.fileops import move_tree, staging_prefix
+from launcher.hash import StreamHasher, check_hash
+from launcher.archive import ZipStreamError, archive_index, extract_archive, extract_members, stream_zip
+from launcher.mods.downloader.segmented import RangeIgnoredError, SegmentedDownload, split_ranges
 
 g_session = create_scraper(
     browser={
@@ -20,6 +29,49 @@ g_session = create_scraper(
 )
 "`cloudscraper` scraper object used for all HTTP requests"
 
+download_state_filename: str = f'{sidecar_prefix}downloads.json'
+"Name of the file used to resume partial downloads, stored in download directories"
+
+stop_downloads: Event = Event()
+"""When set, running downloads raise `launcher.exceptions.DownloadCancelledError` at their next chunk,
+partial files are kept to be resumed (see `launcher.mods.scheduler.DownloadScheduler`)"""
+
+
+def _check_stop(url: str) -> None:
+    if stop_downloads.is_set():
+        raise DownloadCancelledError(f'Download of {url} cancelled')
+
+
+class _ResponseReader:
+    "Binary file-like object reading an HTTP response, every chunk received is given to `on_chunk`"
+
+    def __init__(self, r: Response, on_chunk: Callable[[bytes], None]) -> None:
+        self._chunks: Iterator[bytes] = iter(r.iter_content(chunk_size=1 * 1024 * 1024))
+        self._on_chunk = on_chunk
+        self._buffer = b''
+        self._pos = 0
+
+    def _next(self) -> bool:
+        for chunk in self._chunks:
+            if chunk:
+                self._on_chunk(chunk)
+                self._buffer, self._pos = self._buffer[self._pos:] + chunk, 0
+                return True
+        return False
+
+    def read(self, size: int) -> bytes:
+        if self._pos >= len(self._buffer) and not self._next():
+            return b''
+
+        data = self._buffer[self._pos:self._pos + size]
+        self._pos += len(data)
+        return data
+
+    def drain(self) -> None:
+        "Receive the rest of the response"
+        while self._next():
+            pass
+
 
 class DefaultDownloader:
     """Default downloader used to get an URL and save it to a file
@@ -34,6 +86,19 @@ class DefaultDownloader:
 
     regexp_url = compile("https?://github.com/([\\w_.-]+)/([\\w_.-]+)(/archive/([\\w]+).zip)?")
 
+    segments: int = 1
+    "Number of concurrent connections used to download a file of at least `segment_min_size` bytes"
+
+    segment_min_size: int = 64 * 1024 * 1024
+    "Minimum file size (in bytes) to use a segmented download"
+
+    extra_digests: Tuple[str, ...] = ()
+    "`hashlib` algorithms computed while downloading and recorded in hash cache alongside MD5"
+
+    extract_executor: Optional[Executor] = None
+    """Executor decompressing archives (ie: `launcher.archive.extract_pool()`), so several archives can
+    be extracted at once from different threads. Extraction runs in the calling thread if not set"""
+
     def __init__(self, url: str, filename: str = None, filehash: str = None) -> None:
         self._url = url
         self._archive = None
@@ -76,14 +141,14 @@ class DefaultDownloader:
         self.download(to)
 
         if self._archivehash:
-            if not check_hash(self._archive, self._archivehash):
+            if not check_hash(self._archive, self._archivehash, use_cache=True):
                 raise HashError(f'Hash verification failed after download for {self._archive.name}')
 
     def _check_if_exist(self, to: Path, update_cache: bool = False) -> None:
         if not self._archivehash:
             return
 
-        if check_hash(self._archive, self._archivehash):
+        if check_hash(self._archive, self._archivehash, use_cache=True):
             return
 
         if update_cache:
@@ -99,16 +164,83 @@ class DefaultDownloader:
 
         (self._check_if_exist if self._archive.exists() else self._check_if_non_exist)(to, update_cache)
 
+    @property
+    def _part(self) -> Path:
+        return self._archive.with_name(f'{self._archive.name}.part')
+
+    @staticmethod
+    def _if_range(state: Dict) -> Dict[str, str]:
+        # Weak ETags cannot be used with If-Range
+        etag = state.get('etag') or ''
+        validator = etag if etag and not etag.startswith('W/') else state.get('last_modified')
+        return {'If-Range': validator} if validator else {}
+
+    def _resume_headers(self, state: Optional[Dict]) -> Dict[str, str]:
+        if not state or not self._part.is_file() or not self._part.stat().st_size:
+            return {}
+
+        return {'Range': f'bytes={self._part.stat().st_size}-', **self._if_range(state)}
+
+    @staticmethod
+    def _response_length(r: Response, offset: int) -> Optional[int]:
+        # With a Content-Encoding, Content-Length is not the size written on disk
+        if r.headers.get('Content-Encoding', 'identity') != 'identity':
+            return None
+
+        crange = r.headers.get('Content-Range', '')
+        if crange.startswith('bytes ') and not crange.endswith('/*'):
+            return int(crange.rsplit('/', 1)[1])
+
+        length = r.headers.get('Content-Length', '')
+        return int(length) + offset if length.isdigit() else None
+
+    def _request(self, state: Optional[Dict]) -> Tuple[Optional[Response], int, Optional[int]]:
+        # Response is None if the part file is already complete
+        headers = self._resume_headers(state)
+        r = g_session.get(self._url, stream=True, headers=headers) if headers else g_session.get(self._url, stream=True)
+
+        if headers and r.status_code == 416:
+            # Range starts at or after the end of the remote file
+            r.close()
+            offset = self._part.stat().st_size
+            if r.headers.get('Content-Range', '') == f'bytes */{offset}':
+                return None, offset, offset
+
+            self._part.unlink()
+            return self._request(None)
+
+        r.raise_for_status()
+
+        if not headers or r.status_code != 206:
+            return r, 0, self._response_length(r, 0)
+
+        offset = self._part.stat().st_size
+        length = self._response_length(r, offset)
+        if state.get('length') and length != state['length']:
+            # Remote file changed and server did not catch it with If-Range
+            r.close()
+            self._part.unlink()
+            return self._request(None)
+
+        return r, offset, length
+
     @retry(
-        before_sleep=lambda _: print("Connection error, retrying in 30s..."),
+        before_sleep=lambda s: print(f"Connection error, retrying in {s.next_action.sleep:.0f}s..."),
         reraise=True,
-        retry=retry_if_exception_type(ConnectionError),
+        retry=retry_if_exception_type((ConnectionError, ChunkedEncodingError)),
         stop=stop_after_attempt(3),
-        wait=wait_fixed(30)
+        wait=wait_exponential(multiplier=5, max=30)
     )
     def download(self, to: Path, use_cached=False, hash: str = None) -> Path:
         """Download the file
 
+        Data is written to a *.part* file first, renamed once complete. If interrupted,
+        next call will resume it with an HTTP Range request. Large files are downloaded
+        with multiple connections if `segments` is above 1 and the server accepts ranges.
+
+        The MD5 hash is computed while downloading and stored in the hash cache
+        (see `launcher.hash.check_hash`) so verification does not read the file again.
+
         Argument(s):
         * to -- Folder to save the file
 
@@ -126,25 +258,208 @@ class DefaultDownloader:
             if not hash:
                 return self._archive
 
-            if check_hash(self._archive, hash):
+            if check_hash(self._archive, hash, use_cache=True):
                 return self._archive
 
-        r = g_session.get(self._url, stream=True)
-        r.raise_for_status()
-        with open(self._archive, "wb") as f, tqdm(
+        states = JsonCache.open(self._archive.parent / download_state_filename)
+        hasher = self._fetch_part(states, states.get(self._archive.name))
+
+        self._part.replace(self._archive)
+        states.pop(self._archive.name)
+
+        if hasher:
+            hasher.store(self._archive)
+
+        return self._archive
+
+    def _fetch_part(self, states: JsonCache, state: Optional[Dict]) -> Optional[StreamHasher]:
+        # Return a StreamHasher if digests were computed while downloading
+        if state and state.get('segments') is not None and self._part.is_file():
+            return self._write_segments(states, state)
+
+        if state and state.get('length') and self._part.is_file() and self._part.stat().st_size == state['length']:
+            # Download completed but was not renamed
+            return None
+
+        segmented = self._probe_segments() if self.segments > 1 and not state else None
+        if segmented:
+            return self._write_segments(states, segmented)
+
+        r, offset, length = self._request(state)
+        if not r:
+            # Part file already holds the whole remote file
+            hasher = StreamHasher(self.extra_digests)
+            hasher.update_from_file(self._part, offset)
+            return hasher
+
+        return self._write_part(states, r, offset, length)
+
+    def _probe_segments(self) -> Optional[Dict]:
+        try:
+            r = g_session.head(self._url, allow_redirects=True)
+            r.raise_for_status()
+        except RequestException:
+            return None
+
+        length = r.headers.get('Content-Length', '')
+        if 'bytes' not in r.headers.get('Accept-Ranges', '') or not length.isdigit() or \
+           int(length) < self.segment_min_size:
+            return None
+
+        SegmentedDownload.preallocate(self._part, int(length))
+        return {
+            'url': self._url,
+            'etag': r.headers.get('ETag'),
+            'last_modified': r.headers.get('Last-Modified'),
+            'length': int(length),
+            'segments': split_ranges(int(length), self.segments),
+        }
+
+    def _write_segments(self, states: JsonCache, state: Dict) -> Optional[StreamHasher]:
+        # Ranges are received out of order, file is hashed later on verification
+        pending = [tuple(i) for i in state['segments']]
+        states.set(self._archive.name, {**state, 'segments': pending})
+
+        def on_done(r) -> None:
+            pending.remove(r)
+            states.set(self._archive.name, {**state, 'segments': pending})
+
+        with tqdm(
+            desc=f"  - Downloading {self._archive.name} ({self._url}, {len(pending)} segments)",
+            unit="iB", unit_scale=True, unit_divisor=1024,
+            initial=state['length'] - sum(end - start + 1 for start, end in pending), total=state['length']
+        ) as progress:
+            try:
+                SegmentedDownload(g_session, self._url, self._part, self._if_range(state), stop_downloads).run(
+                    list(pending), progress, on_done
+                )
+                return None
+            except RangeIgnoredError:
+                print(f"    Segmented download not possible for {self._archive.name}, using a single stream")
+
+        states.pop(self._archive.name)
+        return self._write_part(states, *self._request(None))
+
+    def _write_part(self, states: JsonCache, r: Response, offset: int, length: Optional[int]) -> StreamHasher:
+        states.set(self._archive.name, {
+            'url': self._url,
+            'etag': r.headers.get('ETag'),
+            'last_modified': r.headers.get('Last-Modified'),
+            'length': length,
+        })
+
+        hasher = StreamHasher(self.extra_digests)
+        if offset:
+            hasher.update_from_file(self._part, offset)
+
+        with open(self._part, "ab" if offset else "wb") as f, tqdm(
             desc=f"  - Downloading {self._archive.name} ({self._url})",
-            unit="iB", unit_scale=True, unit_divisor=1024
+            unit="iB", unit_scale=True, unit_divisor=1024,
+            initial=offset, total=length
         ) as progress:
             for chunk in r.iter_content(chunk_size=1 * 1024 * 1024):
+                _check_stop(self._url)
                 if chunk:
+                    hasher.update(chunk)
                     progress.update(f.write(chunk))
 
-        return self._archive
+        if length is not None and self._part.stat().st_size != length:
+            raise ConnectionError(
+                f'Incomplete download of {self._archive.name}: '
+                f'{self._part.stat().st_size} bytes received out of {length}'
+            )
+
+        return hasher
+
+    def _run_extract(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        # Arguments are sent to another process if `extract_executor` is a process pool, they must be picklable
+        if self.extract_executor:
+            return self.extract_executor.submit(func, *args, **kwargs).result()
+        return func(*args, **kwargs)
+
+    def _stream_mapping(self) -> Optional[Callable[[str], Optional[str]]]:
+        # Same paths as `extract()`
+        return None
+
+    def _stream_extract(self, to: Path, keep_archive: bool) -> StreamHasher:
+        r, _, length = self._request(None)
+        hasher = StreamHasher(self.extra_digests)
+
+        with closing(r), (open(self._part, 'wb') if keep_archive else nullcontext()) as f, tqdm(
+            desc=f"  - Downloading & extracting {self._archive.name} ({self._url})",
+            unit="iB", unit_scale=True, unit_divisor=1024, total=length
+        ) as progress:
+            def on_chunk(chunk: bytes) -> None:
+                _check_stop(self._url)
+                hasher.update(chunk)
+                progress.update(len(chunk))
+                if f:
+                    f.write(chunk)
+
+            reader = _ResponseReader(r, on_chunk)
+            stream_zip(reader, to, self._stream_mapping())
+            reader.drain()
 
-    def extract(self, to: Path) -> None:
+        return hasher
+
+    def download_extract(self, dl_dir: Path, to: Path, use_cached: bool = False, keep_archive: bool = False) -> None:
+        """Download a zip archive and extract it as data arrives (see `launcher.archive.stream_zip`),
+        instead of writing it with `download()` then reading it again with `extract()`
+
+        `download()` & `extract()` are used if the archive is already in `dl_dir` with `use_cached`,
+        if a partial download of it can be resumed, or if the response cannot be extracted
+        sequentially (ie: not a zip)
+
+        Argument(s):
+        * dl_dir -- Folder where the archive is saved, like `to` of `download()`
+        * to -- Path object pointing to the directory to use for extraction
+
+        Keyword argument(s):
+        * use_cached -- Same as `download()`
+        * keep_archive -- Also write the received archive in `dl_dir`, as `download()` does
+        """
+        self._set_archive_name(dl_dir)
+
+        if not (use_cached and self._archive.exists()) and not self._part.exists():
+            to.parent.mkdir(parents=True, exist_ok=True)
+
+            # Files are moved to `to` once the archive hash is verified, renamed as they are next to it
+            with TemporaryDirectory(prefix=staging_prefix, dir=to.parent) as dir:
+                try:
+                    hasher = self._stream_extract(Path(dir), keep_archive)
+                except (ZipStreamError, ConnectionError, ChunkedEncodingError) as e:
+                    print(f"    Cannot extract {self._archive.name} while downloading it ({e}), downloading it first")
+                    self._part.unlink(missing_ok=True)
+                else:
+                    if self._archivehash and hasher.md5 != self._archivehash:
+                        self._part.unlink(missing_ok=True)
+                        raise HashError(f'Hash verification failed after download for {self._archive.name}')
+                    move_tree(Path(dir), to)
+                    if keep_archive:
+                        self._part.replace(self._archive)
+                        hasher.store(self._archive)
+                    return
+
+        self.download(dl_dir, use_cached)
+        self.extract(to)
+
+    def extract(self, to: Path, predicate: Callable[[str], bool] = None) -> None:
         """Extract the dowloaded archive
 
         Argument(s):
         * to -- Path object pointing to the directory to use for extraction
+
+        Keyword argument(s):
+        * predicate -- Only extract archive members for which it returns True,
+          see `launcher.archive.extract_members`
         """
-        extract_archive(self.archive, to)
+        if predicate:
+            # Index is read here, a single process writes its cache
+            index = archive_index(self.archive)
+            wanted = [i for i in index['members'] if predicate(i)]
+            self._run_extract(
+                extract_members, self.archive, to, set(wanted).__contains__, mime=index['mime'], members=wanted
+            )
+            return
+
+        self._run_extract(extract_archive, self.archive, to)
@@ -1,12 +1,13 @@
-from git import Repo, RemoteProgress
+from git import GitCommandError, Remote, Repo, RemoteProgress
 from os import getenv, environ
-from pathlib import Path
-from shutil import copytree
-from tempfile import TemporaryDirectory
+from pathlib import Path, PurePosixPath
+from subprocess import PIPE, Popen, run
 from tqdm import tqdm
-from typing import Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import tarfile
 
 from launcher.bootstrap import is_in_pyinstaller_context
+from launcher.fileops import unlink_before_write
 from launcher.mods.info import ModInfo
 from launcher.mods.downloader.base import DefaultDownloader
 
@@ -36,7 +37,18 @@ class ProgressPrinter(RemoteProgress):
 
 
 class GithubDownloader(DefaultDownloader):
-    "Specialization of `launcher.mods.downloader.base.DefaultDownloader` to manage Github URLs"
+    """Specialization of `launcher.mods.downloader.base.DefaultDownloader` to manage Github URLs
+
+    `depth` and `blob_filter` can be set on an instance to configure a single resource
+    """
+
+    depth: Optional[int] = None
+    """Only fetch the last `depth` commits of the wanted branch (shallow fetch), None to fetch
+    every branch with their whole history. History is deepened if the revision is not found"""
+
+    blob_filter: Optional[str] = None
+    """Partial clone filter (ie: 'blob:none'), missing objects are fetched in one request
+    when files are checked out"""
 
     def __init__(self, info: ModInfo) -> None:
         super().__init__(info)
@@ -52,6 +64,63 @@ class GithubDownloader(DefaultDownloader):
     def check(self, to: Path, update_cache: bool = False) -> None:
         pass
 
+    def _refspec(self) -> str:
+        prefix = f'{self._user}/'
+        if not self._revision.startswith(prefix):
+            # Commit hash or tag
+            return self._revision
+
+        branch = self._revision[len(prefix):]
+        return f'+refs/heads/{branch}:refs/remotes/{self._user}/{branch}'
+
+    def _fetch_options(self) -> Dict[str, Any]:
+        options = {'progress': ProgressPrinter(self._archive.name, self._user)}
+        if self.blob_filter:
+            options['filter'] = self.blob_filter
+        return options
+
+    def _enable_partial_clone(self, repo: Repo) -> None:
+        with repo.config_writer() as cfg:
+            cfg.set_value('core', 'repositoryformatversion', 1)
+            cfg.set_value('extensions', 'partialClone', self._user)
+            cfg.set_value(f'remote "{self._user}"', 'promisor', True)
+            cfg.set_value(f'remote "{self._user}"', 'partialclonefilter', self.blob_filter)
+
+    def _has_revision(self, repo: Repo) -> bool:
+        try:
+            repo.rev_parse(f'{self._revision}^{{commit}}')
+            return True
+        except Exception:
+            return False
+
+    def _is_up_to_date(self, repo: Repo, remote: Remote) -> bool:
+        refspec = self._refspec()
+        if not refspec.startswith('+'):
+            # A commit never changes
+            return self._has_revision(repo)
+
+        try:
+            local = repo.rev_parse(self._revision).hexsha
+            remote_ref = repo.git.ls_remote(remote.name, refspec[1:].split(':')[0])
+        except Exception:
+            return False
+
+        return remote_ref.split()[:1] == [local]
+
+    def _shallow_fetch(self, repo: Repo, remote: Remote) -> None:
+        try:
+            remote.fetch(self._refspec(), depth=self.depth, **self._fetch_options())
+        except GitCommandError:
+            # Server may refuse to send a commit by its hash
+            print(f'  - Cannot fetch {self._revision} alone')
+
+        if self._has_revision(repo):
+            return
+
+        print(f'  - {self._revision} not found in last {self.depth} commit(s), fetching whole history')
+        options = {'unshallow': True} if (self._archive / 'shallow').is_file() else {}
+        remote.fetch(**options, **self._fetch_options())
+
     def download(self, to: Path, use_cached: bool = False, filename: str = None) -> Path:
         if is_in_pyinstaller_context() and getenv('LD_LIBRARY_PATH'):
             del environ['LD_LIBRARY_PATH']
@@ -65,22 +134,115 @@ class GithubDownloader(DefaultDownloader):
         remote = repo.create_remote(self._user, f"https://github.com/{self._user}/{self._project}") \
             if self._user not in repo.remotes else repo.remotes[self._user]
 
-        remote.fetch(progress=ProgressPrinter(self._archive.name, self._user))
+        if self.blob_filter:
+            self._enable_partial_clone(repo)
 
-        return self._archive
-
-    def extract(self, to: Path) -> None:
-        repo = Repo(self._archive)
+        if self._is_up_to_date(repo, remote):
+            print(f'  - {self._archive.name} already at latest {self._revision} revision, skipping fetch')
+        elif self.depth:
+            self._shallow_fetch(repo, remote)
+        else:
+            remote.fetch(**self._fetch_options())
 
-        with TemporaryDirectory(prefix='gamma-launcher-github-extract-') as dir:
-            pdir = Path(dir)
-            repo.git().execute(['git', 'worktree', 'add', '--detach', str(pdir), self._revision])
-            if pdir != to:
-                copytree(pdir, to, dirs_exist_ok=True)
+        return self._archive
 
-        repo.git().execute(['git', 'worktree', 'prune'])
+    def _git(self, *args: str, input: str = None) -> str:
+        return run(
+            ['git', f'--git-dir={self._archive}', *args], input=input, capture_output=True, text=True, check=True
+        ).stdout
+
+    def _prefetch_blobs(self, mapping: Callable[[str], Optional[str]] = None) -> None:
+        # Without it, each missing file would be fetched with its own request during checkout
+        missing = {
+            i[1:] for i in self._git('rev-list', '--objects', '--missing=print', '--no-walk', self._revision).split()
+            if i.startswith('?')
+        }
+        wanted: List[str] = []
+        for line in self._git('ls-tree', '-r', '-z', self._revision).split('\0'):
+            if not line:
+                continue
+            info, path = line.split('\t', 1)
+            sha = info.split()[2]
+            if sha in missing and (not mapping or mapping(path)):
+                wanted.append(sha)
+
+        if wanted:
+            print(f'  - Fetching {len(wanted)} missing file(s) of {self._archive.name}')
+            # Same as git on-demand fetch of a missing object, for all of them at once
+            self._git(
+                '-c', 'fetch.negotiationAlgorithm=noop', 'fetch', self._user, '--no-tags', '--no-write-fetch-head',
+                '--recurse-submodules=no', f'--filter={self.blob_filter}', '--stdin', input='\n'.join(wanted)
+            )
+
+    def checkout(
+        self, to: Path, mapping: Callable[[str], Optional[str]] = None, pathspecs: Iterable[str] = ()
+    ) -> List[str]:
+        """Write files of the revision directly in a directory, streaming `git archive` output
+
+        Argument(s):
+        * to -- Path object of the destination directory
+
+        Keyword argument(s):
+        * mapping -- Called with each path of the repository, return its path relative to `to`
+          or None to skip it. All files are written at the same path if not set
+        * pathspecs -- Only archive these paths (git pathspec syntax), avoids reading unwanted blobs
+
+        Symbolic and hard links are skipped, paths outside of `to` are rejected
+
+        Return written files, relative to `to`
+        """
+        to.mkdir(parents=True, exist_ok=True)
+        written = []
+        if self.blob_filter:
+            self._prefetch_blobs(mapping)
+
+        cmd = ['git', f'--git-dir={self._archive}', 'archive', '--format=tar', self._revision, '--', *pathspecs]
+
+        with Popen(cmd, stdout=PIPE) as proc, tarfile.open(fileobj=proc.stdout, mode='r|') as tar:
+            for member in tar:
+                # Links from the remote repository could point outside of `to`
+                if not (member.isfile() or member.isdir()):
+                    continue
+
+                name = mapping(member.name) if mapping else member.name
+                if not name:
+                    continue
+
+                # Checked here as the 'data' filter is not available on every Python version
+                if PurePosixPath(name).is_absolute() or Path(name).anchor or '..' in PurePosixPath(name).parts:
+                    raise RuntimeError(f'Unsafe path {name} in {self._archive.name} at {self._revision}')
+
+                if not member.isdir():
+                    unlink_before_write(to / name)
+
+                member.name = name
+                if hasattr(tarfile, 'data_filter'):
+                    tar.extract(member, to, filter='data')
+                else:
+                    tar.extract(member, to)
+
+                if not member.isdir():
+                    written.append(name)
+
+        if proc.returncode != 0:
+            raise RuntimeError(f'git archive failed for {self._archive.name} at {self._revision}')
+
+        return written
+
+    def extract(self, to: Path, predicate: Callable[[str], bool] = None) -> None:
+        self.checkout(to, (lambda x: x if predicate(x) else None) if predicate else None)
+
+    def download_extract(self, dl_dir: Path, to: Path, use_cached: bool = False, keep_archive: bool = False) -> None:
+        "Same as `download()` then `extract()`, `checkout()` already streams files, repository is always kept"
+        self.download(dl_dir, use_cached)
+        self.extract(to)
 
     @property
     def revision(self) -> Optional[str]:
         "Get repository revision"
         return Repo(self._archive).rev_parse(self._revision).hexsha if self._revision else None
+
+    @property
+    def tree(self) -> Optional[str]:
+        "Get hash of the revision tree, identical for commits with the same content"
+        return Repo(self._archive).rev_parse(f'{self._revision}^{{tree}}').hexsha if self._revision else None
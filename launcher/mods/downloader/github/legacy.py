@@ -1,9 +1,10 @@
 from pathlib import Path
-from shutil import copytree
 from tempfile import TemporaryDirectory
-from typing import Optional
+from typing import Callable, Iterable, List, Optional
 
 from launcher.archive import extract_archive
+from launcher.fileops import move_file, staging_prefix
+from launcher.overlay import scan_tree
 from launcher.mods.info import ModInfo
 from launcher.mods.downloader.base import DefaultDownloader, g_session
 
@@ -16,17 +17,19 @@ class GithubDownloader(DefaultDownloader):
     def __init__(self, info: ModInfo) -> None:
         super().__init__(info)
         self._revision = None
+        # `_url` is replaced by the archive URL of the branch
+        self._repo_url = self._url
 
     def check(self, to: Path, update_cache: bool = False) -> None:
         pass
 
-    def download(self, to: Path, use_cached: bool = False, filename: str = None) -> Path:
-        user, project, *_ = self.regexp_url.match(self._url).groups()
+    def _resolve(self, to: Path, filename: str = None) -> None:
+        user, project, *_ = self.regexp_url.match(self._repo_url).groups()
 
-        if "release" in self._url or self._url.endswith(".zip"):
-            self._revision = Path(self._url).name.split('.')[0]
+        if "release" in self._repo_url or self._repo_url.endswith(".zip"):
+            self._revision = Path(self._repo_url).name.split('.')[0]
             self._archive = to / (filename or f"{project}-{self._revision}.zip")
-            return super().download(to, use_cached)
+            return
 
         branch = g_session.get(
             f"https://api.github.com/repos/{user}/{project}",
@@ -41,20 +44,63 @@ class GithubDownloader(DefaultDownloader):
         self._url = f"https://github.com/{user}/{project}/archive/refs/heads/{branch}.zip"
         self._archive = to / (filename or f"{project}-{self._revision}.zip")
 
+    def download(self, to: Path, use_cached: bool = False, filename: str = None) -> Path:
+        self._resolve(to, filename)
         return super().download(to, use_cached)
 
-    def extract(self, to: Path) -> None:
-        with TemporaryDirectory(prefix='gamma-launcher-github-extract-') as dir:
+    def _stream_mapping(self) -> Optional[Callable[[str], Optional[str]]]:
+        # Like `checkout()`, files are written without the top level directory of GitHub archives
+        return lambda x: x.split('/', 1)[1] if '/' in x else None
+
+    def download_extract(self, dl_dir: Path, to: Path, use_cached: bool = False, keep_archive: bool = False) -> None:
+        self._resolve(dl_dir)
+        super().download_extract(dl_dir, to, use_cached, keep_archive)
+
+    def checkout(
+        self, to: Path, mapping: Callable[[str], Optional[str]] = None, pathspecs: Iterable[str] = ()
+    ) -> List[str]:
+        """Write files of the downloaded revision in a directory
+
+        Argument(s):
+        * to -- Path object of the destination directory
+
+        Keyword argument(s):
+        * mapping -- Called with each path of the repository, return its path relative to `to`
+          or None to skip it. All files are written at the same path if not set
+        * pathspecs -- Not supported without git, `mapping` has to filter paths
+
+        Return written files, relative to `to`
+        """
+        to.mkdir(parents=True, exist_ok=True)
+        written = []
+
+        # Extracted next to destination so files are renamed instead of copied
+        with TemporaryDirectory(prefix=staging_prefix, dir=to) as dir:
             pdir = Path(dir)
-            extract_archive(self.archive, str(pdir))
+            self._run_extract(extract_archive, self.archive, str(pdir))
 
             # Detect if the archive contains a dir containing the git tree
             ldir = list(pdir.iterdir())
             if len(ldir) == 1:
                 pdir = ldir[0]
 
-            copytree(pdir, to, dirs_exist_ok=True)
+            for rel, file in scan_tree(pdir):
+                name = mapping(rel) if mapping else rel
+                if name:
+                    (to / name).parent.mkdir(parents=True, exist_ok=True)
+                    move_file(file, to / name)
+                    written.append(name)
+
+        return written
+
+    def extract(self, to: Path, predicate: Callable[[str], bool] = None) -> None:
+        self.checkout(to, (lambda x: x if predicate(x) else None) if predicate else None)
 
     @property
     def revision(self) -> Optional[str]:
         return self._revision
+
+    @property
+    def tree(self) -> Optional[str]:
+        "Tree hash is not available without git"
+        return None
@@ -3,18 +3,31 @@ import re
 from bs4 import BeautifulSoup
 from pathlib import Path
 from requests.exceptions import HTTPError
-from typing import Dict
+from time import time
+from typing import Dict, Optional, Tuple
 
+from launcher.cache import JsonCache, sidecar_prefix
 from launcher.exceptions import HashError, ModDBDownloadError
+from launcher.hash import check_hash, get_cached_hash
 from launcher.mods.downloader.base import DefaultDownloader, g_session
 
+metadata_cache_filename: str = f'{sidecar_prefix}moddb.json'
+"Name of the ModDB metadata cache file, stored in download directories"
+
 
 class ModDBDownloader(DefaultDownloader):
     "Specialization of `launcher.mods.downloader.base.DefaultDownloader` to manage ModDB URLs"
 
+    metadata_ttl: int = 24 * 3600
+    "Time (in seconds) cached ModDB metadata stay valid, 0 to always refresh them"
+
+    mirror_ttl: int = 15 * 60
+    "Time (in seconds) a resolved mirror link stays valid, capped by `metadata_ttl`"
+
     def __init__(self, url: str, iurl: str) -> None:
         super().__init__(url)
         self._iurl = iurl
+        self._start_url = url
 
     @staticmethod
     def _parse_moddb_metadata(url: str) -> Dict[str, str]:
@@ -53,12 +66,62 @@ class ModDBDownloader(DefaultDownloader):
 
         return g_session.get(f"https://www.moddb.com{s[0]}", allow_redirects=False).headers["location"]
 
-    def _set_vars_from_metadata(self):
-        if not self._iurl:
+    @staticmethod
+    def _is_fresh(entry: Dict, ttl: int) -> bool:
+        return bool(entry) and time() - entry.get('timestamp', 0) < ttl
+
+    def _metadata(self, to: Path) -> Dict[str, str]:
+        cache = JsonCache.open(to / metadata_cache_filename)
+        entry = cache.get(self._iurl)
+        if self._is_fresh(entry, self.metadata_ttl):
+            return entry
+
+        metadata = self._parse_moddb_metadata(self._iurl)
+        cache.set(self._iurl, {**metadata, 'timestamp': time()})
+        return metadata
+
+    def _download_url(self, to: Path, refresh: bool = False) -> Tuple[str, bool]:
+        # Return the mirror URL and True if it came from cache
+        cache = JsonCache.open(to / metadata_cache_filename)
+        entry = cache.get(self._start_url)
+        if not refresh and self._is_fresh(entry, min(self.metadata_ttl, self.mirror_ttl)):
+            return entry['mirror'], True
+
+        mirror = self._get_download_url(self._start_url)
+        cache.set(self._start_url, {**(entry or {}), 'mirror': mirror, 'timestamp': time()})
+        return mirror, False
+
+    def _cached_archive(self, to: Path) -> Optional[Path]:
+        # Archive recorded by a previous download, only if it still matches its hash
+        entry = JsonCache.open(to / metadata_cache_filename).get(self._start_url) or {}
+        if not entry.get('archive') or not entry.get('md5'):
+            return None
+
+        archive = to / entry['archive']
+        if not archive.is_file() or not check_hash(archive, entry['md5'], use_cache=True):
+            return None
+
+        self._user_wanted_name = archive.name
+        self._archivehash = entry['md5']
+        self._archive = archive
+        return archive
+
+    def _record_archive(self, to: Path) -> None:
+        digest = self._archivehash or get_cached_hash(self._archive)
+        if not digest:
             return
 
+        cache = JsonCache.open(to / metadata_cache_filename)
+        cache.set(self._start_url, {
+            **(cache.get(self._start_url) or {}), 'archive': self._archive.name, 'md5': digest
+        })
+
+    def _set_vars_from_metadata(self, to: Path) -> Dict[str, str]:
+        if not self._iurl:
+            return {}
+
         try:
-            metadata = self._parse_moddb_metadata(self._iurl) if self._iurl else {}
+            metadata = self._metadata(to)
 
             self._archivehash = metadata.get('MD5 Hash', None)
             self._user_wanted_name = metadata.get('Filename', None)
@@ -71,7 +134,7 @@ class ModDBDownloader(DefaultDownloader):
         if not self._iurl:
             raise HashError('No Info URL provided for this mod')
 
-        metadata = self._set_vars_from_metadata()
+        metadata = self._set_vars_from_metadata(to)
 
         if not self._user_wanted_name:
             raise ModDBDownloadError(f'Could not find Filename in {self._iurl}')
@@ -79,15 +142,41 @@ class ModDBDownloader(DefaultDownloader):
         if not self._archivehash:
             raise ModDBDownloadError(f'Could not find archive hash in {self._iurl}')
 
-        if metadata.get('Download', '') not in self._url:
+        if metadata.get('Download', '') not in self._start_url:
             raise ModDBDownloadError(f'Skipping {self._user_wanted_name} since ModDB info do not match download url')
 
-        self._url = self._get_download_url(self._url)
-
+        # Mirror is resolved by download() only if needed
         super().check(to, update_cache)
 
-    def download(self, to: Path, use_cached: bool = False, *args, **kwargs) -> Path:
-        self._set_vars_from_metadata()
-        self._url = self._get_download_url(self._url)
+    def _download(self, to: Path, use_cached: bool) -> Path:
+        self._set_vars_from_metadata(to)
+        self._url, cached = self._download_url(to)
 
+        try:
+            return super().download(to, use_cached)
+        except HTTPError:
+            if not cached:
+                raise
+
+        # Cached mirror link may have expired
+        self._url, _ = self._download_url(to, refresh=True)
         return super().download(to, use_cached)
+
+    def download(self, to: Path, use_cached: bool = False, *args, **kwargs) -> Path:
+        """Download the file, see `launcher.mods.downloader.base.DefaultDownloader.download`
+
+        With `use_cached`, an archive recorded by a previous download which still matches
+        its MD5 hash is used without any request, unless metadata refresh is forced
+        (`metadata_ttl` set to 0)
+        """
+        if use_cached and self.metadata_ttl and self._cached_archive(to):
+            return self._archive
+
+        archive = self._download(to, use_cached)
+        self._record_archive(to)
+        return archive
+
+    def download_extract(self, dl_dir: Path, to: Path, use_cached: bool = False, keep_archive: bool = False) -> None:
+        "Same as `download()` then `extract()`, ModDB archives are always kept"
+        self.download(dl_dir, use_cached)
+        self.extract(to)
@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from requests.exceptions import ConnectionError
+from threading import Event, Lock
+from tqdm import tqdm
+from typing import Callable, Dict, List, Optional, Tuple
+
+from launcher.exceptions import DownloadCancelledError
+
+Range = Tuple[int, int]
+"Inclusive byte range, as used in HTTP Range header"
+
+
+class RangeIgnoredError(ConnectionError):
+    "Raised when a server answers a range request with the whole file (or a changed file)"
+    pass
+
+
+def split_ranges(length: int, segments: int) -> List[Range]:
+    """Split a file in byte ranges of the same size
+
+    Argument(s):
+    * length -- File size in bytes
+    * segments -- Number of ranges wanted
+
+    Return a list of inclusive (start, end) tuples
+    """
+    segments = max(min(segments, length), 1)
+    size = -(-length // segments)
+    return [(start, min(start + size, length) - 1) for start in range(0, length, size)]
+
+
+class SegmentedDownload:
+    """Download a file with concurrent HTTP Range requests into a preallocated file
+
+    Argument(s):
+    * session -- `requests.Session` like object used for requests
+    * url -- Remote file URL
+    * file -- Path object of the preallocated file to write to
+
+    Keyword argument(s):
+    * headers -- Extra headers sent with every request (ie: If-Range)
+    * stop -- When set, ranges raise `launcher.exceptions.DownloadCancelledError` at their next chunk
+    """
+
+    def __init__(
+        self, session, url: str, file: Path, headers: Dict[str, str] = None, stop: Optional[Event] = None
+    ) -> None:
+        self._session = session
+        self._url = url
+        self._file = file
+        self._headers = headers or {}
+        self._stop = stop
+        self._lock = Lock()
+
+    @staticmethod
+    def preallocate(file: Path, length: int) -> None:
+        "Create `file` with its final size so ranges can be written at their offset"
+        with open(file, 'wb') as f:
+            f.truncate(length)
+
+    def _fetch(self, r: Range, progress: tqdm) -> Range:
+        start, end = r
+        resp = self._session.get(
+            self._url, stream=True,
+            headers={**self._headers, 'Range': f'bytes={start}-{end}'}
+        )
+        resp.raise_for_status()
+        if resp.status_code != 206:
+            resp.close()
+            raise RangeIgnoredError(f'Server did not honor range {start}-{end} for {self._url}')
+
+        written = 0
+        with open(self._file, 'r+b') as f:
+            f.seek(start)
+            for chunk in resp.iter_content(chunk_size=1024 * 1024):
+                if self._stop and self._stop.is_set():
+                    resp.close()
+                    raise DownloadCancelledError(f'Download of {self._url} cancelled')
+                if not chunk:
+                    continue
+                chunk = chunk[:end - start + 1 - written]
+                written += f.write(chunk)
+                with self._lock:
+                    progress.update(len(chunk))
+
+        if written != end - start + 1:
+            raise ConnectionError(f'Incomplete range {start}-{end} for {self._url}: {written} bytes received')
+
+        return r
+
+    def run(self, ranges: List[Range], progress: tqdm, on_done: Callable[[Range], None] = None) -> None:
+        """Download all ranges concurrently, one connection per range
+
+        Argument(s):
+        * ranges -- Ranges to download
+        * progress -- `tqdm` object updated with received bytes
+
+        Keyword argument(s):
+        * on_done -- Called with each range once fully written
+
+        Raise `requests.exceptions.ConnectionError` if a range could not be downloaded,
+        completed ranges have been reported to `on_done` anyway. `RangeIgnoredError`
+        is raised first if a range request was not honored by the server
+        """
+        with ThreadPoolExecutor(max_workers=len(ranges) or 1, thread_name_prefix='gamma-launcher-segment') as ex:
+            futures = [ex.submit(self._fetch, r, progress) for r in ranges]
+            errors = []
+            for future in as_completed(futures):
+                try:
+                    r = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+
+                if on_done:
+                    on_done(r)
+
+        if errors:
+            raise next((e for e in errors if isinstance(e, (DownloadCancelledError, RangeIgnoredError))), errors[0])
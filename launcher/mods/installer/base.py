@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from launcher.mods.info import ModInfo
 from launcher.mods.downloader import DownloaderFactory
@@ -26,18 +26,60 @@ class BaseInstaller:
 
         return self._dl.download(to, use_cached)
 
-    def extract(self, to: Path) -> None:
+    def extract(self, to: Path, predicate: Callable[[str], bool] = None) -> None:
         if not self._dl:
             raise RuntimeError(
                 f'{self.info.name} does not support extract() method'
                 'since it does not depend on an archive'
             )
 
-        self._dl.extract(to)
+        self._dl.extract(to, predicate)
+
+    def download_extract(self, dl_dir: Path, to: Path, use_cached: bool = False, keep_archive: bool = False) -> None:
+        """Download and extract the archive at once, see `DefaultDownloader.download_extract`
+
+        Argument(s):
+        * dl_dir -- Folder where the archive is saved
+        * to -- Path object of the extraction directory
+
+        Keyword argument(s):
+        * use_cached -- If set to True, an archive already in `dl_dir` is used
+        * keep_archive -- Also write the archive in `dl_dir`
+        """
+        if not self._dl:
+            raise RuntimeError(
+                f'{self.info.name} does not support download_extract() method'
+                'since no URL was provided'
+            )
+
+        self._dl.download_extract(dl_dir, to, use_cached, keep_archive)
+
+    def stage(self, to: Path = None) -> None:
+        """Prepare installation ahead of `install()` (ie: archive extraction)
+
+        Keyword argument(s):
+        * to -- Path object of the directory that will be given to `install()`
+
+        Default implementation does nothing, everything is done by `install()`
+        """
+        pass
+
+    def fingerprint(self) -> Optional[Dict[str, Any]]:
+        """Inputs of the installation, used to know if an installed mod is up to date
+        (see `launcher.mods.manifest.InstallManifest`)
+
+        Default implementation returns None: the mod is installed every time
+        """
+        return None
 
     def install(self, to: Path) -> None:
         self.extract(to)
 
+    @property
+    def installed_files(self) -> List[str]:
+        "Files written by last `install()` call, relative to its directory"
+        return []
+
     @property
     def archive(self) -> Path:
         if not self._dl:
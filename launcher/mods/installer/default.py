@@ -1,9 +1,13 @@
 from pathlib import Path
-from shutil import copytree
-from typing import Dict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 import xml.etree.ElementTree as ET
 
+from launcher import __version__
+from launcher.archive import archive_index
 from launcher.common import folder_to_install
+from launcher.fileops import move_tree, staging_prefix
+from launcher.hash import get_hash
+from launcher.mods.info import ModInfo
 from launcher.tempfile import DefaultTempDir
 from launcher.mods.installer.base import BaseInstaller
 
@@ -11,6 +15,12 @@ from launcher.mods.installer.base import BaseInstaller
 class DefaultInstaller(BaseInstaller):
     "Installer which is used for ModDB provided mods"
 
+    def __init__(self, info: ModInfo) -> None:
+        super().__init__(info)
+        self._staged: Optional[Tuple[DefaultTempDir, Path]] = None
+        self._installed: Set[Path] = set()
+        self._install_root: Optional[Path] = None
+
     @staticmethod
     def _read_fomod_directives(dir: Path) -> Dict[Path, Path]:
         module_config = dir / 'fomod' / 'ModuleConfig.xml'
@@ -53,35 +63,109 @@ class DefaultInstaller(BaseInstaller):
             'size=1\n'
         )
 
+    def fingerprint(self) -> Optional[Dict[str, Any]]:
+        """Launcher version, modpack_maker line and archive hash used for installation
+
+        FOMOD directives are read from the archive, so they are covered by its hash.
+        Return None if the archive was not downloaded
+        """
+        if not self.archive.is_file():
+            return None
+
+        return {
+            'launcher': __version__,
+            'url': self.info.url,
+            'archive': self.archive.name,
+            'md5': get_hash(self.archive),
+            'subdirs': self.info.subdirs,
+            'args': list(self.info.args) if self.info.args else None,
+        }
+
+    @staticmethod
+    def _normalize_member(name: str) -> str:
+        # Same rules as DefaultTempDir hotfixes: backslash separators & folder case
+        return name.replace('\\', '/').strip('/').lower()
+
+    def _wanted_members(self) -> Optional[Callable[[str], bool]]:
+        if not self.archive.is_file():
+            # Git repositories are checked out by their downloader, no index to read
+            return None
+
+        names = archive_index(self.archive)['members']
+        if any(self._normalize_member(i) == 'fomod/moduleconfig.xml' for i in names):
+            # FOMOD directives can point anywhere in the archive
+            return None
+
+        roots = [''] + [f'{self._normalize_member(i)}/' for i in self.info.subdirs or []]
+        prefixes = tuple(f'{r}{d}/' for r in roots for d in folder_to_install)
+        return lambda name: self._normalize_member(name).startswith(prefixes)
+
+    def _extract_wanted(self, to: Path) -> None:
+        self.extract(to, self._wanted_members())
+
+    def stage(self, to: Path = None) -> None:
+        """Extract the archive in a staging directory, its files are moved later by `install()`
+
+        Keyword argument(s):
+        * to -- Path object of the install directory, staging directory is created inside
+          so files are renamed instead of copied. If not set, TMPDIR is used
+        """
+        if to:
+            to.mkdir(parents=True, exist_ok=True)
+
+        staging = DefaultTempDir(
+            self._extract_wanted, prefix=staging_prefix if to else "gamma-launcher-modinstall-", dir=to
+        )
+        self._staged = (staging, staging.__enter__())
+
+    def _install_from(self, pdir: Path, install_dir: Path) -> None:
+        iterator = [pdir] + ([pdir / i for i in self.info.subdirs] if self.info.subdirs else [])
+        fdirectives = self._read_fomod_directives(pdir)
+        for i in iterator:
+            if pdir != i:
+                print(f'    Installing {i.name} -> {install_dir}')
+
+            if not i.exists():
+                print(f'    WARNING: {i.name} does not exist')
+
+            if i in fdirectives.keys():
+                fdir = install_dir / fdirectives[i]
+                print(f'        Appying FOMOD directive to {i} -> {fdir}')
+                move_tree(i, fdir, on_file=self._installed.add)
+                continue
+
+            # Well, I guess it's a feature now.
+            # Maybe I'm not that lazy after all
+            for gamedir in folder_to_install:
+                pgame_dir = i / gamedir
+
+                if not pgame_dir.exists():
+                    continue
+
+                move_tree(pgame_dir, install_dir / gamedir, on_file=self._installed.add)
+
     def install(self, to: Path) -> None:
         install_dir = to / self.info.name
         install_dir.mkdir(exist_ok=True)
+        self._installed = set()
+        self._install_root = to
 
-        with DefaultTempDir(lambda x: self.extract(x), prefix="gamma-launcher-modinstall-") as pdir:
-            iterator = [pdir] + ([pdir / i for i in self.info.subdirs] if self.info.subdirs else [])
-            fdirectives = self._read_fomod_directives(pdir)
-            for i in iterator:
-                if pdir != i:
-                    print(f'    Installing {i.name} -> {install_dir}')
-
-                if not i.exists():
-                    print(f'    WARNING: {i.name} does not exist')
-
-                if i in fdirectives.keys():
-                    fdir = install_dir / fdirectives[i]
-                    print(f'        Appying FOMOD directive to {i} -> {fdir}')
-                    fdir.mkdir(exist_ok=True)
-                    copytree(i, fdir, dirs_exist_ok=True)
-                    continue
+        if not self._staged:
+            self.stage(to)
 
-                # Well, I guess it's a feature now.
-                # Maybe I'm not that lazy after all
-                for gamedir in folder_to_install:
-                    pgame_dir = i / gamedir
+        staging, pdir = self._staged
+        try:
+            self._install_from(pdir, install_dir)
+        finally:
+            staging.cleanup()
+            self._staged = None
 
-                    if not pgame_dir.exists():
-                        continue
+        self._write_ini_file(install_dir / 'meta.ini')
+        self._installed.add(install_dir / 'meta.ini')
 
-                    copytree(pgame_dir, install_dir / gamedir, dirs_exist_ok=True)
+    @property
+    def installed_files(self) -> List[str]:
+        if not self._install_root:
+            return []
 
-        self._write_ini_file(install_dir / 'meta.ini')
+        return sorted(i.relative_to(self._install_root).as_posix() for i in self._installed)
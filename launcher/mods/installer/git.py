@@ -1,38 +1,81 @@
 from pathlib import Path
-from shutil import copytree
-from tempfile import TemporaryDirectory
-from typing import Iterator
+from typing import Dict, List, Optional
 
+from launcher.cache import JsonCache, file_identity, sidecar_prefix
 from launcher.mods.info import ModInfo
 from launcher.mods.installer.base import BaseInstaller
 
+git_install_state_filename: str = f'{sidecar_prefix}git-resources.json'
+"Name of the file recording installed revision of git resources, stored in download directory"
+
 
 class GitResourceInstaller(BaseInstaller):
-    "Installer used to install Github based mods / ressources"
+    """Installer used to install Github based mods / ressources
+
+    Argument(s):
+    * info -- Mod information, only URL is used
+
+    Keyword argument(s):
+    * find_gamedata -- Install every gamedata folder of the repository instead of its top level folders
+    * depth -- Shallow fetch depth (see `launcher.mods.downloader.GithubDownloader.depth`)
+    * blob_filter -- Partial clone filter (see `launcher.mods.downloader.GithubDownloader.blob_filter`)
+    """
 
-    def __init__(self, info: ModInfo, find_gamedata: bool = False) -> None:
+    def __init__(
+        self, info: ModInfo, find_gamedata: bool = False, depth: Optional[int] = None, blob_filter: Optional[str] = None
+    ) -> None:
         super().__init__(info)
         self._find_gamedata = find_gamedata
+        # Ignored by the legacy downloader, used when git is not available
+        self._dl.depth = depth
+        self._dl.blob_filter = blob_filter
 
     @staticmethod
-    def _gamedata_iterator(p: Path) -> Iterator[Path]:
-        return p.glob('**/gamedata')
+    def _gamedata_mapping(name: str) -> Optional[str]:
+        # Every gamedata folder of the repository is merged in destination gamedata
+        parts = name.split('/')
+        return '/'.join(parts[parts.index('gamedata'):]) if 'gamedata' in parts[:-1] else None
+
+    @staticmethod
+    def _toplevel_dir_mapping(name: str) -> Optional[str]:
+        # Top level folders only, files at the root of the repository are skipped
+        return name if '/' in name.rstrip('/') else None
+
+    def _state_key(self, to: Path) -> str:
+        return f'{self.info.url} {"gamedata" if self._find_gamedata else "toplevel"} {to.absolute()}'
 
     @staticmethod
-    def _toplevel_dir_iterator(p: Path) -> Iterator[Path]:
-        for i in p.iterdir():
-            if i.is_dir():
-                yield i
+    def _is_intact(to: Path, files: Dict[str, Dict[str, int]]) -> bool:
+        # Files replaced since (ie: by a mod reinstalled on top) are detected with their identity
+        try:
+            return all(file_identity(to / k) == v for k, v in files.items())
+        except OSError:
+            return False
+
+    def _checkout(self, to: Path) -> List[str]:
+        if self._find_gamedata:
+            return self.downloader.checkout(to, self._gamedata_mapping, (':(glob)**/gamedata/**',))
+
+        return self.downloader.checkout(to, self._toplevel_dir_mapping)
 
     def install(self, to: Path) -> None:
-        print(f'[+] Installing Git Resource mod: {self.info.url}')
         to.mkdir(exist_ok=True)
 
-        iterator = self._gamedata_iterator if self._find_gamedata else self._toplevel_dir_iterator
+        state = JsonCache.open(self.downloader.archive.parent / git_install_state_filename)
+        key = self._state_key(to)
+        entry = state.get(key) or {}
+        tree = self.downloader.tree
 
-        with TemporaryDirectory(prefix="gamma-launcher-modinstall-") as dir:
-            pdir = Path(dir)
-            self.extract(pdir)
+        if tree and entry.get('tree') == tree and self._is_intact(to, entry.get('files', {})):
+            print(f'[*] Git Resource mod already installed at revision {entry["revision"]}: {self.info.url}')
+            return
+
+        print(f'[+] Installing Git Resource mod: {self.info.url}')
+        files = self._checkout(to)
 
-            for i in iterator(pdir):
-                copytree(i, to / i.name, dirs_exist_ok=True)
+        if tree:
+            state.set(key, {
+                'revision': self.downloader.revision,
+                'tree': tree,
+                'files': {i: file_identity(to / i) for i in files},
+            })
@@ -0,0 +1,78 @@
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from launcher.cache import read_json, sidecar_prefix, write_json
+from launcher.fileops import prune_empty_dirs
+
+install_manifest_dirname: str = f'{sidecar_prefix}install'
+"Name of the install manifest directory, created in GAMMA directory"
+
+
+class InstallManifest:
+    """Record of installed mods: inputs used for installation and files written
+
+    One JSON file is written per mod, so updating a mod does not rewrite
+    the whole manifest.
+
+    Argument(s):
+    * path -- Path object of the manifest directory
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+
+    def _file(self, name: str) -> Path:
+        return self._path / f'{name}.json'
+
+    def names(self) -> List[str]:
+        "Return the name of every recorded mod"
+        if not self._path.is_dir():
+            return []
+
+        return [i.name[:-len('.json')] for i in self._path.glob('*.json')]
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        return read_json(self._file(name))
+
+    def set(self, name: str, inputs: Dict[str, Any], files: Iterable[str]) -> None:
+        """Record a mod installation
+
+        Argument(s):
+        * name -- Mod name
+        * inputs -- Everything the installation depends on (see `BaseInstaller.fingerprint`)
+        * files -- Written files, relative to the mods directory
+        """
+        self._path.mkdir(parents=True, exist_ok=True)
+        write_json(self._file(name), {'inputs': inputs, 'files': sorted(files)}, indent=1)
+
+    def remove(self, name: str) -> None:
+        self._file(name).unlink(missing_ok=True)
+
+    def is_installed(self, name: str, inputs: Optional[Dict[str, Any]], mod_dir: Path) -> bool:
+        """Tell if a mod is installed with the same inputs and all its files are still present
+
+        Argument(s):
+        * name -- Mod name
+        * inputs -- Current inputs of the mod, None if it cannot be tracked
+        * mod_dir -- Path object of the mods directory
+        """
+        entry = self.get(name)
+        if not inputs or not entry or entry.get('inputs') != inputs:
+            return False
+
+        return all((mod_dir / i).exists() for i in entry.get('files', []))
+
+    def uninstall(self, name: str, mod_dir: Path) -> None:
+        """Remove recorded files of a mod, then empty directories left and its record
+
+        Argument(s):
+        * name -- Mod name
+        * mod_dir -- Path object of the mods directory
+        """
+        files = [mod_dir / i for i in (self.get(name) or {}).get('files', [])]
+        for i in files:
+            i.unlink(missing_ok=True)
+
+        prune_empty_dirs(files, mod_dir)
+
+        self.remove(name)
@@ -0,0 +1,133 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from queue import Empty, Full, Queue
+from threading import Event, Thread
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from launcher.mods.installer import BaseInstaller
+from launcher.mods.scheduler import DownloadScheduler
+
+_end_of_stage = object()
+"Marker sent through queues when a stage is done"
+
+
+class InstallPipeline:
+    """Overlap download, extraction and installation of mods
+
+    Each stage is linked to the next one with a bounded queue, mods are handed
+    back by `run()` in the same order they were given.
+
+    Argument(s):
+    * scheduler -- A `launcher.mods.scheduler.DownloadScheduler` used for the download stage
+
+    Keyword argument(s):
+    * download_ahead -- Maximum number of mods downloading / downloaded waiting for extraction
+    * extract_ahead -- Maximum number of mods extracted waiting for installation
+    * needs_install -- Called with each downloaded mod, mods for which it returns False are not staged
+    * install_dir -- Directory given to `install()`, passed to `stage()` so extraction happens on the same filesystem
+    * extract_jobs -- Number of mods staged at once, `extract_ahead` is raised to it if lower.
+      Decompression itself runs where `launcher.mods.downloader.DefaultDownloader.extract_executor` sends it
+    """
+
+    def __init__(
+        self, scheduler: DownloadScheduler, download_ahead: int = 8, extract_ahead: int = 2,
+        needs_install: Callable[[BaseInstaller], bool] = None, install_dir: Optional[Path] = None,
+        extract_jobs: int = 1
+    ) -> None:
+        self._scheduler = scheduler
+        self._install_dir = install_dir
+        self._needs_install = needs_install or (lambda _: True)
+        self._extract_jobs = max(extract_jobs, 1)
+        self._downloads = Queue(maxsize=max(download_ahead, 1))
+        self._extracted = Queue(maxsize=max(extract_ahead, self._extract_jobs))
+        self._stop = Event()
+        self._failed = Event()
+
+    @property
+    def status(self) -> Dict[str, int]:
+        "Current queue depths: mods waiting for extraction and mods being extracted or waiting for installation"
+        return {
+            'downloads': self._downloads.qsize(),
+            'extracted': self._extracted.qsize(),
+        }
+
+    def _put(self, queue: Queue, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+
+        return False
+
+    def _get(self, queue: Queue) -> Optional[Any]:
+        while not self._stop.is_set():
+            try:
+                return queue.get(timeout=0.1)
+            except Empty:
+                continue
+
+        return None
+
+    def _download_stage(self, mods: Iterable[BaseInstaller]) -> None:
+        for mod in mods:
+            if not self._put(self._downloads, (mod, self._scheduler.submit(mod))):
+                return
+
+        self._put(self._downloads, _end_of_stage)
+
+    def _stage(self, mod: BaseInstaller, download: Future) -> bool:
+        if self._failed.is_set() or self._stop.is_set():
+            # A previous mod failed or the pipeline is stopped, `run()` never reaches this one
+            return False
+
+        try:
+            download.result()
+            install = self._needs_install(mod)
+            if install:
+                mod.stage(self._install_dir)
+            return install
+        except Exception:
+            self._failed.set()
+            raise
+
+    def _extract_stage(self) -> None:
+        executor = ThreadPoolExecutor(self._extract_jobs, thread_name_prefix='gamma-launcher-pipeline-extract')
+        try:
+            while (item := self._get(self._downloads)) not in (None, _end_of_stage):
+                mod, future = item
+                if not self._put(self._extracted, (mod, executor.submit(self._stage, mod, future))):
+                    return
+
+            self._put(self._extracted, _end_of_stage)
+        finally:
+            executor.shutdown(cancel_futures=self._stop.is_set())
+
+    def run(self, mods: Iterable[BaseInstaller]) -> Iterator[Tuple[BaseInstaller, bool]]:
+        """Start the pipeline
+
+        Argument(s):
+        * mods -- Mods to process, in install order
+
+        Yield downloaded mods in order, with a bool telling if the mod was staged
+        and has to be installed (see `needs_install`).
+        Download or extraction errors are raised when the failing mod is reached
+        """
+        self._stop.clear()
+        self._failed.clear()
+        threads = (
+            Thread(target=self._download_stage, args=(mods,), name='gamma-launcher-pipeline-dl', daemon=True),
+            Thread(target=self._extract_stage, name='gamma-launcher-pipeline-extract', daemon=True),
+        )
+        for t in threads:
+            t.start()
+
+        try:
+            while (item := self._extracted.get()) is not _end_of_stage:
+                mod, future = item
+                yield mod, future.result()
+        finally:
+            self._stop.set()
+            for t in threads:
+                t.join()
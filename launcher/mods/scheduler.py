@@ -0,0 +1,106 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from threading import BoundedSemaphore
+from typing import Dict, Iterable, Iterator, Optional
+from urllib.parse import urlparse
+
+from launcher.mods.downloader.base import stop_downloads
+from launcher.mods.installer import BaseInstaller
+
+default_host_limits: Dict[str, int] = {
+    'moddb.com': 2,
+    'github.com': 4,
+}
+"Default maximum of concurrent downloads per domain"
+
+
+class DownloadScheduler:
+    """Run `BaseInstaller.download` of many mods in parallel and hand them back in order
+
+    Argument(s):
+    * to -- Path object pointing to the download directory
+
+    Keyword argument(s):
+    * jobs -- Maximum number of concurrent downloads
+    * host_limits -- Maximum number of concurrent downloads per domain (subdomains included)
+    """
+
+    def __init__(self, to: Path, jobs: int = 4, host_limits: Dict[str, int] = None) -> None:
+        self._to = to
+        self._jobs = max(jobs, 1)
+        self._limits = {
+            domain: BoundedSemaphore(max(limit, 1))
+            for domain, limit in (default_host_limits if host_limits is None else host_limits).items()
+        }
+        self._executor = None
+        self._shared: Dict[str, Future] = {}
+
+    def __enter__(self) -> 'DownloadScheduler':
+        self._executor = ThreadPoolExecutor(max_workers=self._jobs, thread_name_prefix='gamma-launcher-dl')
+        return self
+
+    def __exit__(self, exc_type, *args) -> None:
+        if exc_type:
+            # Do not wait for running downloads to complete, they stop at their next chunk
+            stop_downloads.set()
+
+        try:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        finally:
+            stop_downloads.clear()
+            self._executor = None
+            self._shared = {}
+
+    def _host_semaphore(self, url: str) -> Optional[BoundedSemaphore]:
+        host = urlparse(url).hostname or ''
+        for domain, semaphore in self._limits.items():
+            if host == domain or host.endswith(f'.{domain}'):
+                return semaphore
+
+        return None
+
+    def _download(self, mod: BaseInstaller, shared: Optional[Future] = None) -> Optional[Path]:
+        if shared:
+            # Archive is downloaded once, by the first mod using it
+            shared.result()
+            return mod.download(self._to, use_cached=True)
+
+        semaphore = self._host_semaphore(mod.info.url)
+        if not semaphore:
+            return mod.download(self._to, use_cached=True)
+
+        with semaphore:
+            return mod.download(self._to, use_cached=True)
+
+    def submit(self, mod: BaseInstaller) -> Future:
+        """Start downloading a mod
+
+        Argument(s):
+        * mod -- Mod to download
+
+        Mods sharing an URL wait for the first one to download it, so the same
+        archive is never written by two threads
+
+        Return a `concurrent.futures.Future` resolved when download is done
+        """
+        if not self._executor:
+            raise RuntimeError('DownloadScheduler must be used as a context manager')
+
+        shared = self._shared.get(mod.info.url)
+        if shared:
+            return self._executor.submit(self._download, mod, shared)
+
+        future = self._shared[mod.info.url] = self._executor.submit(self._download, mod)
+        return future
+
+    def ordered(self, mods: Iterable[BaseInstaller]) -> Iterator[BaseInstaller]:
+        """Download mods concurrently and yield them in order as soon as they are available
+
+        Argument(s):
+        * mods -- Mods to download, in install order
+
+        Download errors are raised when the failing mod is reached
+        """
+        for mod, future in [(mod, self.submit(mod)) for mod in mods]:
+            future.result()
+            yield mod
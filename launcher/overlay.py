@@ -0,0 +1,117 @@
+"""
+Resolution of directories stacked on top of each other, like ModOrganizer virtual filesystem does
+"""
+
+from os import scandir
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from launcher.fileops import link_file, prune_empty_dirs
+
+
+def scan_tree(root: Path, prefix: str = '') -> Iterator[Tuple[str, Path]]:
+    """Walk a directory with `os.scandir`
+
+    Argument(s):
+    * root -- Path object of the directory to walk
+
+    Keyword argument(s):
+    * prefix -- Prefix added to yielded relative paths
+
+    Yield (relative path as posix str, Path object) for every file
+    """
+    stack = [(Path(root), prefix)]
+    while stack:
+        dir, rel = stack.pop()
+        with scandir(dir) as it:
+            for entry in it:
+                if entry.is_dir():
+                    stack.append((Path(entry.path), f'{rel}{entry.name}/'))
+                elif entry.is_file():
+                    yield f'{rel}{entry.name}', Path(entry.path)
+
+
+class Overlay:
+    """Index of the file winning for each relative path across layers,
+    each layer overriding files of the previous ones
+    """
+
+    def __init__(self) -> None:
+        self._files: Dict[str, Tuple[str, Path]] = {}
+        self._overridden: Dict[str, List[str]] = {}
+
+    def add_layer(self, name: str, root: Path, prefix: str = '') -> None:
+        """Add a directory on top of the overlay
+
+        Argument(s):
+        * name -- Layer name, used in conflict report
+        * root -- Path object of the layer directory
+
+        Keyword argument(s):
+        * prefix -- Relative path where the layer is mounted in the overlay (ie: 'bin/')
+
+        Raise `FileNotFoundError` if `root` does not exist
+        """
+        for rel, path in scan_tree(root, prefix):
+            previous = self._files.get(rel)
+            if previous:
+                self._overridden.setdefault(rel, [previous[0]]).append(name)
+            self._files[rel] = (name, path)
+
+    @property
+    def files(self) -> Dict[str, Tuple[str, Path]]:
+        "Relative path: (layer name, source Path object) of every file"
+        return self._files
+
+    @property
+    def conflicts(self) -> Dict[str, List[str]]:
+        "Relative path: layer names providing it, the last one wins, for every overridden file"
+        return self._overridden
+
+    def conflict_report(self) -> str:
+        "Return a readable conflict report, grouped by winning layer"
+        by_winner: Dict[str, List[str]] = {}
+        for rel, layers in sorted(self._overridden.items()):
+            by_winner.setdefault(layers[-1], []).append(f'  {rel} (overrides: {", ".join(layers[:-1])})')
+
+        return '\n'.join(f'{winner}:\n' + '\n'.join(lines) for winner, lines in by_winner.items())
+
+    def materialize(
+        self, to: Path, mode: str = 'copy', copy_only: Tuple[str, ...] = (),
+        previous: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> Tuple[Dict[str, Dict[str, Any]], int, int]:
+        """Write every file of the overlay once in a directory
+
+        Argument(s):
+        * to -- Path object of the destination directory
+
+        Keyword argument(s):
+        * mode -- One of `launcher.fileops.link_modes`
+        * copy_only -- Top level directories always copied
+        * previous -- State returned by a previous call for `to`: only files with a different
+          source, size or modification time are written, files not in overlay anymore are removed
+
+        Return a tuple (state of `to`, number of files written, number of files removed)
+        """
+        previous = previous or {}
+        state = {}
+        written = 0
+
+        for d in sorted({str(Path(rel).parent) for rel in self._files}):
+            (to / d).mkdir(parents=True, exist_ok=True)
+
+        for rel, (_, src) in self._files.items():
+            st = src.stat()
+            state[rel] = {'src': str(src), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+            if previous.get(rel) == state[rel] and (to / rel).is_file():
+                continue
+
+            link_file(src, to / rel, 'copy' if rel.split('/', 1)[0] in copy_only else mode)
+            written += 1
+
+        removed = [to / rel for rel in previous.keys() - state.keys()]
+        for i in removed:
+            i.unlink(missing_ok=True)
+        prune_empty_dirs(removed, to)
+
+        return state, written, len(removed)
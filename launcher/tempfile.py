@@ -1,27 +1,57 @@
+from os import makedirs, replace, rmdir, scandir
+from os.path import dirname, join
 from pathlib import Path
 from platform import system
 from tempfile import TemporaryDirectory
-from typing import Callable
+from typing import Callable, List, Optional, Tuple
 
 from launcher.common import folder_to_install
 
 
+def _path_case_moves(dir: Path) -> Tuple[List[Tuple[str, str]], List[str]]:
+    # Single scandir pass: (source, target) of every file below a miscased folder & miscased folders
+    moves, dirs = [], []
+    stack: List[Tuple[str, Optional[str]]] = [(str(dir), None)]
+    while stack:
+        path, target = stack.pop()
+        with scandir(path) as it:
+            for entry in it:
+                if not entry.is_dir(follow_symlinks=False):
+                    if target is not None:
+                        moves.append((entry.path, join(target, entry.name)))
+                    continue
+
+                lower = entry.name.lower()
+                sub = join(target, lower) if target is not None else \
+                    join(path, lower) if lower in folder_to_install and entry.name != lower else None
+                if sub is not None:
+                    dirs.append(entry.path)
+                stack.append((entry.path, sub))
+
+    return moves, dirs
+
+
 class HotfixPathCase:
     """Class adding a method to `DefaultTempDir` object to fix
     path case of files contained in temporary directory
     """
 
     def _post_decompression_hotfix_fix_path_case(self, dir: Path) -> None:
-        for path in filter(
-            lambda x: x.name.lower() in folder_to_install and x.name != x.name.lower(),
-            dir.glob('**')
-        ):
-            for file in path.glob('**/*.*'):
-                t = file.relative_to(path.parent)
-                rp = str(t.parent).lower()  # TODO: Check if lowering filename too will be OK
-                nfolder = path.parent / rp
-                nfolder.mkdir(parents=True, exist_ok=True)
-                file.rename(nfolder / file.name)
+        # Folders below a miscased appdata / db / gamedata are lowered, not filenames
+        moves, dirs = _path_case_moves(dir)
+
+        for d in sorted({dirname(dst) for _, dst in moves}):
+            makedirs(d, exist_ok=True)
+
+        for src, dst in moves:
+            replace(src, dst)
+
+        for d in sorted(dirs, reverse=True):
+            try:
+                rmdir(d)
+            except OSError:
+                # Not a miscased folder anymore (ie: target of another one) or not empty
+                pass
 
 
 class HotfixMalformedArchive:
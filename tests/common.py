@@ -25,8 +25,11 @@ class MockedResponse:
         return self._headers
 
     def raise_for_status(self) -> None:
-        if self._status != 200:
+        if self._status >= 400:
             raise HTTPError('MockedResponse not happy')
 
+    def close(self) -> None:
+        pass
+
     def iter_content(self, *args, **kwargs) -> List[bytes]:
         return [self._file.read_bytes()] if self._file else []
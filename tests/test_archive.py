@@ -1,10 +1,14 @@
 from pathlib import Path
+from io import BytesIO
 from platform import system
+from shutil import copy, which
 from tempfile import TemporaryDirectory
 from typing import List
 from unittest import mock, TestCase, skipIf
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
 
-from launcher.archive import extract_archive, get_mime_from_file, list_archive_content
+from launcher.archive import archive_index, archive_index_dirname, extract_archive, extract_members, \
+    get_mime_from_file, list_archive_content, read_archive_index, sevenzip_backends, stream_zip, ZipStreamError
 
 from common import data_dir
 
@@ -54,6 +58,67 @@ class ExtractTestCase(TestCase):
         self._run_extract_test(data_dir / 'test.zip')
 
 
+class ExtractMembersTestCase(TestCase):
+
+    def _run_extract_members_test(self, archive: Path) -> None:
+        with TemporaryDirectory(prefix='gamma-launcher-archive-extraction-test-') as dir:
+            self.assertEqual(extract_members(archive, dir, lambda x: False), [])
+            self.assertEqual(list(Path(dir).iterdir()), [])
+
+            self.assertEqual(extract_members(archive, dir, lambda x: x == 'flag'), ['flag'])
+            self.assertEqual((Path(dir) / 'flag').read_text().strip(), 'success')
+
+    def test_extract_members_7zip(self):
+        self._run_extract_members_test(data_dir / 'test.7z')
+
+    def test_extract_members_rar(self):
+        self._run_extract_members_test(data_dir / 'test.rar')
+
+    def test_extract_members_zip(self):
+        self._run_extract_members_test(data_dir / 'test.zip')
+
+    def test_extract_members_subdir(self):
+        with TemporaryDirectory(prefix='gamma-launcher-archive-extraction-test-') as dir:
+            extract_members(data_dir / 'test-git-archive.zip', dir, lambda x: x.startswith('project-main/'))
+            self.assertEqual((Path(dir) / 'project-main' / 'flag').read_text().strip(), 'success')
+
+
+@skipIf(system() == 'Windows', 'Only make sense on *nix')
+class SevenZipBackendTestCase(TestCase):
+
+    def _extract_with(self, backend: str, archive: Path = data_dir / 'test.7z') -> None:
+        with mock.patch('launcher.archive.sevenzip_backend', backend), \
+             TemporaryDirectory(prefix='gamma-launcher-archive-extraction-test-') as dir:
+            extract_archive(archive, dir)
+            self.assertEqual((Path(dir) / 'flag').read_text().strip(), 'success')
+
+            (Path(dir) / 'flag').unlink()
+            extract_members(archive, dir, lambda x: x == 'flag')
+            self.assertEqual((Path(dir) / 'flag').read_text().strip(), 'success')
+
+    def test_available_backends(self):
+        for name, backend in sevenzip_backends.items():
+            if backend.executable and not which(backend.executable):
+                continue
+            with self.subTest(backend=name):
+                self._extract_with(name)
+
+    @mock.patch('launcher.archive._is_available', lambda x: x is None)
+    def test_fallback_to_py7zr(self):
+        self._extract_with('7z')
+
+    @mock.patch('launcher.archive._is_available', lambda x: x == 'bsdtar' or x is None)
+    @mock.patch('launcher.archive._py7zr_extractall')
+    def test_bcj2_not_with_py7zr(self, mock_func):
+        self._extract_with('py7zr', data_dir / 'test-bcj2-filter.7z')
+        mock_func.assert_not_called()
+
+    @mock.patch('launcher.archive._is_available', lambda x: x is None)
+    def test_no_backend_for_bcj2(self):
+        with self.assertRaises(RuntimeError):
+            self._extract_with('py7zr', data_dir / 'test-bcj2-filter.7z')
+
+
 class ListTestCase(TestCase):
 
     def _list_archive_test(self, archive: Path, expect: List[str] = ['flag']) -> None:
@@ -74,3 +139,109 @@ class ListTestCase(TestCase):
         self._list_archive_test(data_dir / 'test-git-archive.zip', [
             'project-main/', 'project-main/flag'
         ])
+
+
+class ArchiveIndexTestCase(TestCase):
+
+    def test_read_archive_index(self):
+        for name, mime in (
+            ('test.7z', 'application/x-7z-compressed'),
+            ('test.rar', 'application/x-rar'),
+            ('test.zip', 'application/zip'),
+        ):
+            index = read_archive_index(str(data_dir / name))
+            self.assertEqual(index['mime'], mime)
+            self.assertEqual(index['members'], list_archive_content(str(data_dir / name)))
+            self.assertEqual(index['sizes'], {'flag': 8})
+
+    def test_read_archive_index_methods(self):
+        index = read_archive_index(str(data_dir / 'test-bcj2-filter.7z'))
+        self.assertIn('BCJ2*', index['methods'])
+        self.assertTrue(index['solid'])
+
+    def test_archive_index_cached(self):
+        with TemporaryDirectory() as dir:
+            archive = Path(dir) / 'test.zip'
+            copy(data_dir / 'test.zip', archive)
+            expected = read_archive_index(str(archive))
+
+            with mock.patch('launcher.archive.read_archive_index', wraps=read_archive_index) as mock_read:
+                self.assertEqual(archive_index(archive), expected)
+                self.assertEqual(archive_index(archive), expected)
+                self.assertEqual(mock_read.call_count, 1)
+                self.assertTrue((Path(dir) / archive_index_dirname / 'test.zip.json').is_file())
+
+                copy(data_dir / 'test-git-archive.zip', archive)
+                self.assertEqual(archive_index(archive)['members'], ['project-main/', 'project-main/flag'])
+                self.assertEqual(mock_read.call_count, 2)
+
+    def test_archive_index_per_archive(self):
+        with TemporaryDirectory() as dir:
+            for name in ('test.zip', 'test.7z'):
+                copy(data_dir / name, Path(dir) / name)
+                archive_index(Path(dir) / name)
+
+            self.assertEqual(
+                sorted(i.name for i in (Path(dir) / archive_index_dirname).iterdir()), ['test.7z.json', 'test.zip.json']
+            )
+
+
+class _UnseekableWriter:
+    # zipfile writes data descriptors when the output is not seekable
+
+    def __init__(self) -> None:
+        self.data = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self.data += data
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+class StreamZipTestCase(TestCase):
+
+    members = {'dir/big': bytes(range(256)) * 8192, 'dir/small': b'data', 'empty': b''}
+
+    def _zip(self, compression: int, seekable: bool = True) -> bytes:
+        out = BytesIO() if seekable else _UnseekableWriter()
+        with ZipFile(out, 'w', compression) as z:
+            z.writestr('dir/', '')
+            for name, data in self.members.items():
+                z.writestr(name, data)
+        return out.getvalue() if seekable else bytes(out.data)
+
+    def _assert_stream(self, archive: bytes) -> None:
+        with TemporaryDirectory() as dir:
+            self.assertEqual(stream_zip(BytesIO(archive), Path(dir)), list(self.members))
+            for name, data in self.members.items():
+                self.assertEqual((Path(dir) / name).read_bytes(), data)
+
+    def test_deflated(self):
+        self._assert_stream(self._zip(ZIP_DEFLATED))
+
+    def test_deflated_data_descriptor(self):
+        self._assert_stream(self._zip(ZIP_DEFLATED, seekable=False))
+
+    def test_stored(self):
+        self._assert_stream(self._zip(ZIP_STORED))
+
+    def test_stored_data_descriptor(self):
+        with TemporaryDirectory() as dir, self.assertRaises(ZipStreamError):
+            stream_zip(BytesIO(self._zip(ZIP_STORED, seekable=False)), Path(dir))
+
+    def test_mapping(self):
+        with TemporaryDirectory() as dir, open(data_dir / 'test-git-archive.zip', 'rb') as f:
+            self.assertEqual(stream_zip(f, Path(dir), lambda x: x.split('/', 1)[1] or None), ['flag'])
+            self.assertEqual((Path(dir) / 'flag').read_text().strip(), 'success')
+
+    def test_not_a_zip(self):
+        with TemporaryDirectory() as dir, open(data_dir / 'test.7z', 'rb') as f, self.assertRaises(ZipStreamError):
+            stream_zip(f, Path(dir))
+
+    def test_crc_mismatch(self):
+        archive = bytearray(self._zip(ZIP_STORED))
+        archive[archive.index(b'data')] = ord('D')
+        with TemporaryDirectory() as dir, self.assertRaises(ZipStreamError):
+            stream_zip(BytesIO(bytes(archive)), Path(dir))
@@ -0,0 +1,71 @@
+from pathlib import Path
+from typing import Tuple
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from launcher.fileops import break_link, link_tree, move_tree
+
+
+class MoveTreeTestCase(TestCase):
+
+    def test_merge(self):
+        with TemporaryDirectory() as dir:
+            src, dst = Path(dir) / 'src', Path(dir) / 'dst'
+            (src / 'scripts').mkdir(parents=True)
+            (src / 'scripts' / 'new').write_text('new')
+            (src / 'scripts' / 'both').write_text('src')
+            (dst / 'scripts').mkdir(parents=True)
+            (dst / 'scripts' / 'both').write_text('dst')
+            (dst / 'scripts' / 'old').write_text('old')
+            moved = []
+
+            move_tree(src, dst, on_file=moved.append)
+
+            self.assertEqual(sorted(moved), [dst / 'scripts' / 'both', dst / 'scripts' / 'new'])
+            self.assertEqual((dst / 'scripts' / 'both').read_text(), 'src')
+            self.assertEqual((dst / 'scripts' / 'old').read_text(), 'old')
+            self.assertEqual(list((src / 'scripts').iterdir()), [])
+
+
+class LinkTreeTestCase(TestCase):
+
+    def _link_tree(self, mode: str) -> Tuple[Path, Path]:
+        dir = Path(self._dir.name)
+        src, dst = dir / 'src', dir / 'dst'
+        (src / 'gamedata').mkdir(parents=True)
+        (src / 'appdata').mkdir(parents=True)
+        (src / 'gamedata' / 'file').write_text('src')
+        (src / 'appdata' / 'user.ltx').write_text('src')
+        (dst / 'gamedata').mkdir(parents=True)
+        (dst / 'gamedata' / 'file').write_text('dst')
+
+        link_tree(src, dst, mode, copy_only=('appdata',))
+        return src, dst
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_copy(self):
+        src, dst = self._link_tree('copy')
+
+        self.assertEqual((dst / 'gamedata' / 'file').read_text(), 'src')
+        self.assertFalse((dst / 'gamedata' / 'file').samefile(src / 'gamedata' / 'file'))
+
+    def test_hardlink(self):
+        src, dst = self._link_tree('hardlink')
+
+        self.assertTrue((dst / 'gamedata' / 'file').samefile(src / 'gamedata' / 'file'))
+        self.assertFalse((dst / 'appdata' / 'user.ltx').samefile(src / 'appdata' / 'user.ltx'))
+
+        break_link(dst / 'gamedata' / 'file')
+        (dst / 'gamedata' / 'file').write_text('modified')
+        self.assertEqual((src / 'gamedata' / 'file').read_text(), 'src')
+
+    def test_reflink_fallback(self):
+        src, dst = self._link_tree('reflink')
+
+        self.assertEqual((dst / 'gamedata' / 'file').read_text(), 'src')
+        self.assertEqual((dst / 'appdata' / 'user.ltx').read_text(), 'src')
@@ -1,8 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import md5, sha256
 from unittest import TestCase
+from unittest.mock import MagicMock, patch
 from pathlib import Path
+from shutil import copy
+from tempfile import TemporaryDirectory
 from typing import Dict
 
-from launcher.hash import check_hash
+from launcher.hash import aggregated_progress, check_hash, get_cached_hash, hash_cache_filename, hash_file, \
+    hash_methods
 
 from common import data_dir
 
@@ -20,3 +26,70 @@ class CheckHashTestCase(TestCase):
     def test_all_checksum(self):
         for file, checksum in self._files.items():
             self.assertTrue(check_hash(file, checksum))
+
+    def test_aggregated_progress(self):
+        with aggregated_progress('Testing') as progress, ThreadPoolExecutor(max_workers=4) as executor:
+            self.assertTrue(all(executor.map(lambda x: check_hash(*x), self._files.items())))
+            self.assertEqual(progress._progress.n, sum(i.stat().st_size for i in self._files.keys()))
+            self.assertEqual(progress._progress.total, progress._progress.n)
+
+
+class HashFileTestCase(TestCase):
+
+    def test_methods(self):
+        for method in hash_methods:
+            with patch('launcher.hash.hash_method', method), patch('launcher.hash.hash_buffer_size', 100):
+                self.assertTrue(all(check_hash(*i) for i in CheckHashTestCase._files.items()), method)
+
+    def test_partial_and_multiple(self):
+        data = (data_dir / 'test.7z').read_bytes()
+        for method in hash_methods:
+            hashes = [md5(), sha256()]
+            with patch('launcher.hash.hash_method', method), patch('launcher.hash.hash_buffer_size', 7):
+                hash_file(data_dir / 'test.7z', hashes, size=50)
+            self.assertEqual(
+                [i.hexdigest() for i in hashes], [md5(data[:50]).hexdigest(), sha256(data[:50]).hexdigest()]
+            )
+
+    def test_empty_file(self):
+        with TemporaryDirectory() as dir:
+            (Path(dir) / 'empty').touch()
+            for method in hash_methods:
+                with patch('launcher.hash.hash_method', method):
+                    self.assertTrue(check_hash(Path(dir) / 'empty', md5().hexdigest()))
+
+    def test_throttled_progress(self):
+        progress = MagicMock()
+        with patch('launcher.hash.hash_buffer_size', 16), patch('launcher.hash.progress_interval', 3600):
+            hash_file(data_dir / 'test-bcj2-filter.7z', [md5()], progress=progress)
+        progress.update.assert_called_once_with((data_dir / 'test-bcj2-filter.7z').stat().st_size)
+
+
+class HashCacheTestCase(TestCase):
+
+    def test_cache(self):
+        with TemporaryDirectory(prefix='gamma-launcher-hash-cache-test-') as dir:
+            file = Path(dir) / 'test.zip'
+            copy(data_dir / 'test.zip', file)
+
+            self.assertIsNone(get_cached_hash(file))
+            self.assertTrue(check_hash(file, '26134043be9927512a7e47f2e4261605', use_cache=True))
+            self.assertTrue((Path(dir) / hash_cache_filename).is_file())
+            self.assertEqual(get_cached_hash(file), '26134043be9927512a7e47f2e4261605')
+
+            with patch('launcher.hash.compute_hash') as mock_func:
+                self.assertTrue(check_hash(file, '26134043be9927512a7e47f2e4261605', use_cache=True))
+                self.assertFalse(check_hash(file, 'HASH', use_cache=True))
+                mock_func.assert_not_called()
+
+            copy(data_dir / 'test.rar', file)
+            self.assertIsNone(get_cached_hash(file))
+            self.assertTrue(check_hash(file, '37654f57366a85bf54967897f44f809f', use_cache=True))
+
+    def test_no_cache(self):
+        with TemporaryDirectory(prefix='gamma-launcher-hash-cache-test-') as dir:
+            file = Path(dir) / 'test.zip'
+            copy(data_dir / 'test.zip', file)
+
+            self.assertTrue(check_hash(file, '26134043be9927512a7e47f2e4261605'))
+            self.assertFalse((Path(dir) / hash_cache_filename).exists())
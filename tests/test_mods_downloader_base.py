@@ -1,4 +1,4 @@
-from hashlib import md5
+from hashlib import md5, sha256
 from requests.exceptions import ConnectionError, HTTPError
 from unittest import TestCase, skip
 from unittest.mock import patch
@@ -6,8 +6,11 @@ from tempfile import TemporaryDirectory
 from pathlib import Path
 from shutil import copy
 
+from launcher.cache import JsonCache
 from launcher.exceptions import HashError
-from launcher.mods.downloader.base import DefaultDownloader
+from launcher.hash import get_cached_hash
+from launcher.mods.downloader.base import DefaultDownloader, download_state_filename
+from launcher.mods.downloader.segmented import split_ranges
 
 from common import data_dir, MockedResponse
 
@@ -19,6 +22,10 @@ def mocked_get(*args, **kwargs):
     }.get(args[0], MockedResponse(404, None))
 
 
+def mocked_get_7z(*args, **kwargs):
+    return MockedResponse(200, data_dir / 'test.7z')
+
+
 def mocked_retry(*args, **kwargs):
     raise ConnectionError('Mocked Error')
 
@@ -100,6 +107,24 @@ class DefaultDownloaderTestCase(TestCase):
 
         mock_request.assert_called_once_with(self._basic_url, stream=True)
 
+    @patch('launcher.mods.downloader.g_session.get', side_effect=mocked_get)
+    def test_hash_while_downloading(self, mock_request):
+        o = DefaultDownloader(self._basic_url, filehash='26134043be9927512a7e47f2e4261605')
+
+        with TemporaryDirectory(prefix='gamma-launcher-base-downloader-test-') as dir, \
+             patch.object(DefaultDownloader, 'extra_digests', ('sha256',)):
+            pdir = Path(dir)
+
+            with patch('launcher.hash.compute_hash') as mock_hash:
+                o.check(pdir, True)
+                mock_hash.assert_not_called()
+
+            self.assertEqual(get_cached_hash(o.archive), '26134043be9927512a7e47f2e4261605')
+            self.assertEqual(
+                JsonCache.open(pdir / '.gamma-launcher-hashes.json').get('leet.zip')['sha256'],
+                sha256(o.archive.read_bytes()).hexdigest()
+            )
+
     @patch('launcher.mods.downloader.g_session.get', side_effect=mocked_get)
     def test_check_exist(self, mock_request):
         o = DefaultDownloader(self._basic_url, filehash='26134043be9927512a7e47f2e4261605')
@@ -139,6 +164,125 @@ class DefaultDownloaderTestCase(TestCase):
 
         mock_request.assert_called_once_with('http://blablabla/foobar.zip', stream=True)
 
+    def test_resume_download(self):
+        o = DefaultDownloader(self._basic_url)
+        data = (data_dir / 'test.zip').read_bytes()
+
+        with TemporaryDirectory(prefix='gamma-launcher-base-downloader-test-') as dir:
+            pdir = Path(dir)
+            (pdir / 'leet.zip.part').write_bytes(data[:100])
+            (pdir / 'tail').write_bytes(data[100:])
+            JsonCache.open(pdir / download_state_filename).set('leet.zip', {'etag': '"1337"', 'length': len(data)})
+
+            with patch('launcher.mods.downloader.g_session.get', return_value=MockedResponse(
+                206, pdir / 'tail', headers={'Content-Range': f'bytes 100-{len(data) - 1}/{len(data)}'}
+            )) as mock_request:
+                o.download(pdir)
+
+            mock_request.assert_called_once_with(
+                self._basic_url, stream=True, headers={'Range': 'bytes=100-', 'If-Range': '"1337"'}
+            )
+            self.assertEqual(md5(o.archive.read_bytes()).hexdigest(), '26134043be9927512a7e47f2e4261605')
+            self.assertFalse((pdir / 'leet.zip.part').exists())
+            self.assertIsNone(JsonCache.open(pdir / download_state_filename).get('leet.zip'))
+
+    @patch('launcher.mods.downloader.g_session.get', side_effect=mocked_get)
+    def test_resume_not_supported(self, mock_request):
+        o = DefaultDownloader(self._basic_url)
+
+        with TemporaryDirectory(prefix='gamma-launcher-base-downloader-test-') as dir:
+            pdir = Path(dir)
+            (pdir / 'leet.zip.part').write_bytes(b'garbage')
+            JsonCache.open(pdir / download_state_filename).set('leet.zip', {'etag': '"1337"', 'length': None})
+
+            o.download(pdir)
+            self.assertEqual(md5(o.archive.read_bytes()).hexdigest(), '26134043be9927512a7e47f2e4261605')
+
+        mock_request.assert_called_once_with(
+            self._basic_url, stream=True, headers={'Range': 'bytes=7-', 'If-Range': '"1337"'}
+        )
+
+    def test_resume_already_complete(self):
+        o = DefaultDownloader(self._basic_url)
+        data = (data_dir / 'test.zip').read_bytes()
+
+        with TemporaryDirectory(prefix='gamma-launcher-base-downloader-test-') as dir:
+            pdir = Path(dir)
+            (pdir / 'leet.zip.part').write_bytes(data)
+            JsonCache.open(pdir / download_state_filename).set('leet.zip', {'etag': '"1337"', 'length': None})
+
+            with patch('launcher.mods.downloader.g_session.get', return_value=MockedResponse(
+                416, None, headers={'Content-Range': f'bytes */{len(data)}'}
+            )) as mock_request:
+                o.download(pdir)
+
+            mock_request.assert_called_once()
+            self.assertEqual(md5(o.archive.read_bytes()).hexdigest(), '26134043be9927512a7e47f2e4261605')
+            self.assertFalse((pdir / 'leet.zip.part').exists())
+            self.assertIsNone(JsonCache.open(pdir / download_state_filename).get('leet.zip'))
+
+    def test_resume_unsatisfiable(self):
+        o = DefaultDownloader(self._basic_url)
+        data = (data_dir / 'test.zip').read_bytes()
+
+        with TemporaryDirectory(prefix='gamma-launcher-base-downloader-test-') as dir:
+            pdir = Path(dir)
+            (pdir / 'leet.zip.part').write_bytes(data + b'garbage')
+            JsonCache.open(pdir / download_state_filename).set('leet.zip', {'etag': '"1337"', 'length': None})
+
+            with patch('launcher.mods.downloader.g_session.get', side_effect=[
+                MockedResponse(416, None, headers={'Content-Range': f'bytes */{len(data)}'}),
+                MockedResponse(200, data_dir / 'test.zip'),
+            ]) as mock_request:
+                o.download(pdir)
+
+            self.assertEqual(mock_request.call_count, 2)
+            mock_request.assert_called_with(self._basic_url, stream=True)
+            self.assertEqual(md5(o.archive.read_bytes()).hexdigest(), '26134043be9927512a7e47f2e4261605')
+
+    def _segmented_download(self, tmpdir: Path, honor_range: bool = True):
+        data = (data_dir / 'test.zip').read_bytes()
+        calls = []
+
+        def mocked_range_get(url, stream=False, headers=None):
+            calls.append((headers or {}).get('Range'))
+            if not honor_range or not headers or 'Range' not in headers:
+                return MockedResponse(200, data_dir / 'test.zip', headers={'Content-Length': str(len(data))})
+
+            start, end = (int(i) for i in headers['Range'][len('bytes='):].split('-'))
+            segment = tmpdir / f'segment-{start}'
+            segment.write_bytes(data[start:end + 1])
+            return MockedResponse(206, segment)
+
+        o = DefaultDownloader(self._basic_url)
+        with patch.object(DefaultDownloader, 'segments', 4), patch.object(DefaultDownloader, 'segment_min_size', 0), \
+             patch('launcher.mods.downloader.g_session.head', return_value=MockedResponse(
+                 200, None, headers={'Accept-Ranges': 'bytes', 'Content-Length': str(len(data))}
+             )), patch('launcher.mods.downloader.g_session.get', side_effect=mocked_range_get):
+            o.download(tmpdir)
+
+        self.assertEqual(md5(o.archive.read_bytes()).hexdigest(), '26134043be9927512a7e47f2e4261605')
+        self.assertIsNone(JsonCache.open(tmpdir / download_state_filename).get('leet.zip'))
+        return calls
+
+    def test_segmented_download(self):
+        with TemporaryDirectory(prefix='gamma-launcher-base-downloader-test-') as dir:
+            calls = self._segmented_download(Path(dir))
+
+        size = (data_dir / 'test.zip').stat().st_size
+        self.assertEqual(sorted(calls), sorted(f'bytes={s}-{e}' for s, e in split_ranges(size, 4)))
+
+    def test_segmented_download_fallback(self):
+        with TemporaryDirectory(prefix='gamma-launcher-base-downloader-test-') as dir:
+            calls = self._segmented_download(Path(dir), honor_range=False)
+
+        self.assertEqual(calls[-1], None)
+
+    def test_split_ranges(self):
+        self.assertEqual(split_ranges(10, 3), [(0, 3), (4, 7), (8, 9)])
+        self.assertEqual(split_ranges(2, 4), [(0, 0), (1, 1)])
+        self.assertEqual(split_ranges(100, 1), [(0, 99)])
+
     @skip('Take a minute')
     @patch('launcher.mods.downloader.g_session.get', side_effect=mocked_retry)
     def test_retry_and_fail(self, mock_request):
@@ -150,3 +294,68 @@ class DefaultDownloaderTestCase(TestCase):
             o.download(Path(dir))
 
         self.assertEqual(len(mock_request.call_args_list), 3)
+
+
+class DownloadExtractTestCase(TestCase):
+
+    @patch('launcher.mods.downloader.g_session.get', side_effect=mocked_get)
+    def test_stream(self, mock_request):
+        o = DefaultDownloader(DefaultDownloaderTestCase._basic_url)
+
+        with TemporaryDirectory() as dir:
+            dl_dir, to = Path(dir) / 'downloads', Path(dir) / 'out'
+            dl_dir.mkdir()
+
+            o.download_extract(dl_dir, to)
+            self.assertEqual((to / 'flag').read_text().strip(), 'success')
+            self.assertEqual(list(dl_dir.iterdir()), [])
+
+        mock_request.assert_called_once()
+
+    @patch('launcher.mods.downloader.g_session.get', side_effect=mocked_get)
+    def test_stream_keep_archive(self, mock_request):
+        o = DefaultDownloader(DefaultDownloaderTestCase._basic_url)
+
+        with TemporaryDirectory() as dir:
+            dl_dir, to = Path(dir) / 'downloads', Path(dir) / 'out'
+            dl_dir.mkdir()
+
+            o.download_extract(dl_dir, to, keep_archive=True)
+            self.assertEqual((to / 'flag').read_text().strip(), 'success')
+            self.assertEqual((dl_dir / 'leet.zip').read_bytes(), (data_dir / 'test.zip').read_bytes())
+            self.assertEqual(
+                get_cached_hash(dl_dir / 'leet.zip'), md5((data_dir / 'test.zip').read_bytes()).hexdigest()
+            )
+
+            o.download_extract(dl_dir, to, use_cached=True)
+
+        mock_request.assert_called_once()
+
+    @patch('launcher.mods.downloader.g_session.get', side_effect=mocked_get)
+    def test_stream_hash_mismatch(self, mock_request):
+        o = DefaultDownloader(DefaultDownloaderTestCase._basic_url, filehash='0' * 32)
+
+        with TemporaryDirectory() as dir:
+            dl_dir, to = Path(dir) / 'downloads', Path(dir) / 'out'
+            dl_dir.mkdir()
+
+            with self.assertRaises(HashError):
+                o.download_extract(dl_dir, to, keep_archive=True)
+
+            self.assertFalse(to.exists())
+            self.assertEqual(list(dl_dir.iterdir()), [])
+            self.assertEqual([i.name for i in Path(dir).iterdir()], ['downloads'])
+
+    @patch('launcher.mods.downloader.g_session.get', side_effect=mocked_get_7z)
+    def test_not_a_zip(self, mock_request):
+        o = DefaultDownloader('http://mockedURL/leet.7z')
+
+        with TemporaryDirectory() as dir:
+            dl_dir, to = Path(dir) / 'downloads', Path(dir) / 'out'
+            dl_dir.mkdir()
+
+            o.download_extract(dl_dir, to)
+            self.assertEqual((to / 'flag').read_text().strip(), 'success')
+            self.assertTrue((dl_dir / 'leet.7z').is_file())
+
+        self.assertEqual(mock_request.call_count, 2)
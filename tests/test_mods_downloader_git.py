@@ -0,0 +1,177 @@
+from pathlib import Path
+from subprocess import run
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+
+from git import Repo
+
+from launcher.mods import GitResource, ModDefault
+from launcher.mods.info import ModInfo
+from launcher.mods.downloader.github.git import GithubDownloader
+
+
+class GitResourceCheckoutTestCase(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.root = Path(self._dir.name)
+
+        work = self.root / 'work'
+        for i in ('README.md', 'main/gamedata/scripts/a.script', 'main/textures/b.dds',
+                  'options/x/gamedata/configs/c.ltx', 'docs/d.txt'):
+            (work / i).parent.mkdir(parents=True, exist_ok=True)
+            (work / i).write_text(i)
+        (work / 'docs' / 'escape.txt').symlink_to('../../../escaped.txt')
+
+        git = ['git', '-c', 'user.name=test', '-c', 'user.email=test@test', '-C', str(work)]
+        run([*git, 'init', '-q'], check=True)
+        run([*git, 'add', '.'], check=True)
+        run([*git, 'commit', '-q', '-m', 'init'], check=True)
+        run(['git', 'clone', '-q', '--bare', str(work), str(self.root / 'project.git')], check=True)
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _install(self, gamedata: bool) -> list:
+        mod = GitResource('https://github.com/user/project', gamedata)
+        mod.downloader._set_vars(self.root)
+        mod.downloader._revision = 'HEAD'
+        mod.install(self.root / 'mod')
+        return sorted(i.relative_to(self.root / 'mod').as_posix() for i in (self.root / 'mod').glob('**/*.*'))
+
+    def test_toplevel_dirs(self):
+        self.assertEqual(self._install(False), [
+            'docs/d.txt', 'main/gamedata/scripts/a.script', 'main/textures/b.dds',
+            'options/x/gamedata/configs/c.ltx',
+        ])
+
+    def test_gamedata(self):
+        self.assertEqual(self._install(True), ['gamedata/configs/c.ltx', 'gamedata/scripts/a.script'])
+
+    def test_no_write_through_hardlink(self):
+        (self.root / 'mod' / 'docs').mkdir(parents=True)
+        (self.root / 'linked').write_text('linked')
+        (self.root / 'mod' / 'docs' / 'd.txt').hardlink_to(self.root / 'linked')
+
+        self._install(False)
+
+        self.assertEqual((self.root / 'linked').read_text(), 'linked')
+        self.assertEqual((self.root / 'mod' / 'docs' / 'd.txt').read_text(), 'docs/d.txt')
+
+    def test_default_installer(self):
+        mod = ModDefault(ModInfo({'name': 'mod', 'url': 'https://github.com/user/project', 'subdirs': ['main']}))
+        mod.downloader._set_vars(self.root)
+        mod.downloader._revision = 'HEAD'
+        (self.root / 'mods').mkdir()
+        mod.install(self.root / 'mods')
+
+        self.assertEqual(
+            sorted(i.relative_to(self.root / 'mods').as_posix() for i in (self.root / 'mods').glob('**/*.*')),
+            ['mod/gamedata/scripts/a.script', 'mod/meta.ini']
+        )
+
+    def test_unsafe_mapping_rejected(self):
+        mod = GitResource('https://github.com/user/project', False)
+        mod.downloader._set_vars(self.root)
+        mod.downloader._revision = 'HEAD'
+
+        for mapping in (lambda x: f'../{x}', lambda x: f'/{x}'):
+            with self.assertRaises(RuntimeError):
+                mod.downloader.checkout(self.root / 'mod', mapping)
+
+        self.assertFalse((self.root / 'README.md').exists())
+
+    def test_symlink_skipped(self):
+        self._install(False)
+
+        self.assertFalse((self.root / 'mod' / 'docs' / 'escape.txt').is_symlink())
+        self.assertFalse((self.root / 'escaped.txt').exists())
+
+
+class GithubDownloaderFetchTestCase(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.root = Path(self._dir.name)
+        self.work = self.root / 'work'
+
+        git = ['git', '-c', 'user.name=test', '-c', 'user.email=test@test', '-C', str(self.work)]
+        run(['git', 'init', '-q', '-b', 'main', str(self.work)], check=True)
+        run([*git, 'config', 'uploadpack.allowFilter', 'true'], check=True)
+        self.revs = []
+        for i in range(3):
+            (self.work / 'gamedata').mkdir(exist_ok=True)
+            (self.work / 'gamedata' / f'{i}.script').write_text(str(i))
+            run([*git, 'add', '.'], check=True)
+            run([*git, 'commit', '-q', '-m', str(i)], check=True)
+            self.revs.append(run([*git, 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip())
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _downloader(self, url: str = 'https://github.com/user/project', **kwargs) -> GithubDownloader:
+        o = GithubDownloader(url)
+        for k, v in kwargs.items():
+            setattr(o, k, v)
+
+        dl_dir = self.root / 'downloads'
+        dl_dir.mkdir(exist_ok=True)
+        Repo.init(dl_dir / 'project.git', bare=True).create_remote('user', f'file://{self.work}')
+        return o
+
+    def _count_commits(self) -> int:
+        return int(run(
+            ['git', f'--git-dir={self.root / "downloads" / "project.git"}', 'rev-list', '--count', '--all'],
+            capture_output=True, text=True, check=True
+        ).stdout)
+
+    def test_shallow_blobless(self):
+        o = self._downloader(depth=1, blob_filter='blob:none')
+        o.download(self.root / 'downloads')
+
+        self.assertEqual(o.revision, self.revs[-1])
+        self.assertEqual(self._count_commits(), 1)
+
+        o.checkout(self.root / 'mod')
+        self.assertEqual(sorted(i.name for i in (self.root / 'mod' / 'gamedata').iterdir()), [
+            '0.script', '1.script', '2.script'
+        ])
+
+    def test_deepen_for_custom_revision(self):
+        o = self._downloader(f'https://github.com/user/project/archive/{self.revs[0]}.zip', depth=1)
+        o.download(self.root / 'downloads')
+
+        self.assertEqual(o.revision, self.revs[0])
+        o.checkout(self.root / 'mod')
+        self.assertEqual([i.name for i in (self.root / 'mod' / 'gamedata').iterdir()], ['0.script'])
+
+    def test_skip_fetch_when_up_to_date(self):
+        o = self._downloader(depth=1)
+        o.download(self.root / 'downloads')
+
+        with mock.patch('launcher.mods.downloader.github.git.Remote.fetch') as fetch:
+            o.download(self.root / 'downloads')
+            fetch.assert_not_called()
+
+            (self.work / 'new').write_text('new')
+            git = ['git', '-c', 'user.name=test', '-c', 'user.email=test@test', '-C', str(self.work)]
+            run([*git, 'add', '.'], check=True)
+            run([*git, 'commit', '-q', '-m', 'new'], check=True)
+            o.download(self.root / 'downloads')
+            fetch.assert_called_once()
+
+    def test_skip_install_same_tree(self):
+        mod = GitResource('https://github.com/user/project', True, depth=1)
+        self._downloader()
+        mod.download(self.root / 'downloads')
+        mod.install(self.root / 'mod')
+
+        with mock.patch.object(mod.downloader, 'checkout') as checkout:
+            mod.install(self.root / 'mod')
+            checkout.assert_not_called()
+
+            # A mod installed on top replaced a file
+            (self.root / 'mod' / 'gamedata' / '0.script').unlink()
+            (self.root / 'mod' / 'gamedata' / '0.script').write_text('0')
+            mod.install(self.root / 'mod')
+            checkout.assert_called_once()
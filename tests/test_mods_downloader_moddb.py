@@ -56,3 +56,34 @@ class ModDBDownloaderTestCase(TestCase):
 
             o.download(pdir)
             self.assertTrue((pdir / 'Anomaly-1.5.3-Full.2.7z').exists())
+
+    @patch('launcher.mods.downloader.moddb.g_session.get', side_effect=mocked_get)
+    def test_metadata_cache(self, mock_request) -> None:
+        with TemporaryDirectory(prefix='gamma-launcher-moddb-downloader-test-') as dir:
+            pdir = Path(dir)
+
+            ModDBDownloader(self._dl_start_url, self._mod_page_info).download(pdir)
+            self.assertEqual(len(mock_request.call_args_list), 4)
+
+            mock_request.reset_mock()
+            ModDBDownloader(self._dl_start_url, self._mod_page_info).download(pdir)
+            mock_request.assert_called_once_with(self._dl_url, stream=True)
+
+            mock_request.reset_mock()
+            with patch.object(ModDBDownloader, 'metadata_ttl', 0):
+                ModDBDownloader(self._dl_start_url, self._mod_page_info).download(pdir)
+            self.assertEqual(len(mock_request.call_args_list), 4)
+
+    @patch('launcher.mods.downloader.moddb.g_session.get', side_effect=mocked_get)
+    def test_offline_cached_archive(self, mock_request) -> None:
+        with TemporaryDirectory(prefix='gamma-launcher-moddb-downloader-test-') as dir:
+            pdir = Path(dir)
+
+            ModDBDownloader(self._dl_start_url, '').download(pdir, use_cached=True)
+            self.assertEqual(len(mock_request.call_args_list), 3)
+
+            mock_request.reset_mock()
+            o = ModDBDownloader(self._dl_start_url, '')
+            self.assertEqual(o.download(pdir, use_cached=True), pdir / 'mod.7z')
+            self.assertEqual(o.archive, pdir / 'mod.7z')
+            mock_request.assert_not_called()
@@ -0,0 +1,65 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from zipfile import ZipFile
+
+from launcher.archive import extract_pool
+from launcher.mods import ModDefault
+from launcher.mods.downloader import DefaultDownloader
+from launcher.mods.info import ModInfo
+
+
+class DefaultInstallerTestCase(TestCase):
+
+    def _install(self, members, subdirs=None):
+        with TemporaryDirectory() as dir:
+            dl_dir = Path(dir) / 'downloads'
+            mod_dir = Path(dir) / 'mods'
+            dl_dir.mkdir()
+            mod_dir.mkdir()
+            with ZipFile(dl_dir / 'mod.zip', 'w') as z:
+                for i in members:
+                    z.writestr(i, '<config/>' if i.endswith('.xml') else 'data')
+
+            mod = ModDefault(ModInfo({'name': 'mod', 'url': 'https://somewhere/mod.zip', 'subdirs': subdirs}))
+            mod.download(dl_dir, use_cached=True)
+            wanted = mod._wanted_members()
+            mod.install(mod_dir)
+
+            return (
+                [i for i in members if wanted(i)] if wanted else None,
+                sorted(i.relative_to(mod_dir).as_posix() for i in mod_dir.glob('**/*') if i.is_file())
+            )
+
+    def test_subdirs(self):
+        extracted, installed = self._install([
+            'Main/gamedata/a.script', 'Main/readme.txt',
+            'Option A/gamedata/b.script', 'Option B/Gamedata/Scripts/c.script',
+            'gamedata/d.script', 'other/e.script',
+        ], subdirs=['Main', 'Option B'])
+
+        self.assertEqual(extracted, [
+            'Main/gamedata/a.script', 'Option B/Gamedata/Scripts/c.script', 'gamedata/d.script'
+        ])
+        self.assertEqual(installed, [
+            'mod/gamedata/a.script', 'mod/gamedata/d.script', 'mod/gamedata/scripts/c.script', 'mod/meta.ini'
+        ])
+
+    def test_fomod_extracts_everything(self):
+        extracted, installed = self._install([
+            'fomod/ModuleConfig.xml', 'gamedata/a.script',
+        ])
+
+        self.assertIsNone(extracted)
+        self.assertEqual(installed, ['mod/gamedata/a.script', 'mod/meta.ini'])
+
+    def test_extract_executor(self):
+        with extract_pool(2) as pool:
+            DefaultDownloader.extract_executor = pool
+            try:
+                extracted, installed = self._install(['gamedata/a.script', 'readme.txt'])
+            finally:
+                DefaultDownloader.extract_executor = None
+
+        self.assertEqual(extracted, ['gamedata/a.script'])
+        self.assertEqual(installed, ['mod/gamedata/a.script', 'mod/meta.ini'])
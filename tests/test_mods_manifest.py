@@ -0,0 +1,72 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from zipfile import ZipFile
+
+from launcher.mods import ModDefault
+from launcher.mods.info import ModInfo
+from launcher.mods.manifest import InstallManifest
+
+
+class InstallManifestTestCase(TestCase):
+
+    def test_is_installed(self):
+        with TemporaryDirectory() as dir:
+            mod_dir = Path(dir) / 'mods'
+            (mod_dir / 'mod' / 'gamedata').mkdir(parents=True)
+            (mod_dir / 'mod' / 'gamedata' / 'file').write_text('data')
+            manifest = InstallManifest(Path(dir) / 'manifest')
+
+            self.assertFalse(manifest.is_installed('mod', {'md5': 'a'}, mod_dir))
+
+            manifest.set('mod', {'md5': 'a'}, ['mod/gamedata/file'])
+            self.assertEqual(manifest.names(), ['mod'])
+            self.assertTrue(manifest.is_installed('mod', {'md5': 'a'}, mod_dir))
+            self.assertFalse(manifest.is_installed('mod', {'md5': 'b'}, mod_dir))
+            self.assertFalse(manifest.is_installed('mod', None, mod_dir))
+
+            (mod_dir / 'mod' / 'gamedata' / 'file').unlink()
+            self.assertFalse(manifest.is_installed('mod', {'md5': 'a'}, mod_dir))
+
+    def test_uninstall(self):
+        with TemporaryDirectory() as dir:
+            mod_dir = Path(dir) / 'mods'
+            (mod_dir / 'mod' / 'gamedata' / 'scripts').mkdir(parents=True)
+            (mod_dir / 'mod' / 'gamedata' / 'scripts' / 'file').write_text('data')
+            (mod_dir / 'mod' / 'user-file').write_text('data')
+            manifest = InstallManifest(Path(dir) / 'manifest')
+            manifest.set('mod', {'md5': 'a'}, ['mod/gamedata/scripts/file'])
+
+            manifest.uninstall('mod', mod_dir)
+
+            self.assertFalse((mod_dir / 'mod' / 'gamedata').exists())
+            self.assertTrue((mod_dir / 'mod' / 'user-file').exists())
+            self.assertTrue(mod_dir.is_dir())
+            self.assertEqual(manifest.names(), [])
+
+
+class DefaultInstallerManifestTestCase(TestCase):
+
+    def test_installed_files_and_fingerprint(self):
+        with TemporaryDirectory() as dir:
+            dl_dir = Path(dir) / 'downloads'
+            mod_dir = Path(dir) / 'mods'
+            dl_dir.mkdir()
+            mod_dir.mkdir()
+            with ZipFile(dl_dir / 'mod.zip', 'w') as z:
+                z.writestr('gamedata/scripts/file.script', 'data')
+                z.writestr('readme.txt', 'ignored')
+
+            mod = ModDefault(ModInfo({'name': 'mod', 'url': 'https://somewhere/mod.zip'}))
+            mod.download(dl_dir, use_cached=True)
+            inputs = mod.fingerprint()
+            mod.install(mod_dir)
+
+            self.assertEqual(mod.installed_files, ['mod/gamedata/scripts/file.script', 'mod/meta.ini'])
+            self.assertEqual([i.name for i in mod_dir.iterdir()], ['mod'])
+            self.assertEqual(inputs['archive'], 'mod.zip')
+            self.assertEqual(inputs, mod.fingerprint())
+
+            with ZipFile(dl_dir / 'mod.zip', 'a') as z:
+                z.writestr('gamedata/new', 'data')
+            self.assertNotEqual(inputs, mod.fingerprint())
@@ -0,0 +1,97 @@
+from pathlib import Path
+from threading import Lock
+from time import sleep
+from unittest import TestCase
+
+from launcher.mods.info import ModInfo
+from launcher.mods.pipeline import InstallPipeline
+from launcher.mods.scheduler import DownloadScheduler
+
+
+class MockedMod:
+
+    def __init__(self, name: str, delay: float = 0.0, fail: str = '') -> None:
+        self.info = ModInfo({'name': name, 'url': f'https://somewhere/{name}.7z'})
+        self.staged = False
+        self._delay = delay
+        self._fail = fail
+
+    def download(self, to: Path, use_cached: bool = False) -> Path:
+        sleep(self._delay)
+        if self._fail == 'download':
+            raise ConnectionError('Mocked Error')
+        return to / f'{self.info.name}.7z'
+
+    def stage(self, to: Path = None) -> None:
+        if self._fail == 'stage':
+            raise RuntimeError('Mocked Error')
+        self.staged = True
+
+
+class ConcurrentMockedMod(MockedMod):
+    lock = Lock()
+    running = 0
+    max_running = 0
+
+    def stage(self, to: Path = None) -> None:
+        cls = ConcurrentMockedMod
+        with cls.lock:
+            cls.running += 1
+            cls.max_running = max(cls.max_running, cls.running)
+        sleep(0.05)
+        super().stage(to)
+        with cls.lock:
+            cls.running -= 1
+
+
+class InstallPipelineTestCase(TestCase):
+
+    def test_ordered_and_staged(self):
+        mods = [MockedMod(str(i), 0.01 * (6 - i)) for i in range(6)]
+
+        with DownloadScheduler(Path('/tmp'), jobs=3) as scheduler:
+            pipeline = InstallPipeline(scheduler, download_ahead=3, extract_ahead=1)
+            result = list(pipeline.run(mods))
+
+        self.assertEqual(result, [(i, True) for i in mods])
+        self.assertTrue(all(i.staged for i in mods))
+        self.assertEqual(pipeline.status, {'downloads': 0, 'extracted': 0})
+
+    def test_download_error(self):
+        mods = [MockedMod('ok'), MockedMod('fail', fail='download'), MockedMod('never')]
+
+        with DownloadScheduler(Path('/tmp'), jobs=1) as scheduler:
+            it = InstallPipeline(scheduler).run(mods)
+            self.assertEqual(next(it), (mods[0], True))
+            with self.assertRaises(ConnectionError):
+                next(it)
+
+        self.assertFalse(mods[2].staged)
+
+    def test_stage_error(self):
+        mods = [MockedMod('fail', fail='stage'), MockedMod('never')]
+
+        with self.assertRaises(RuntimeError), DownloadScheduler(Path('/tmp'), jobs=1) as scheduler:
+            list(InstallPipeline(scheduler).run(mods))
+
+    def test_needs_install(self):
+        mods = [MockedMod(str(i)) for i in range(4)]
+
+        with DownloadScheduler(Path('/tmp'), jobs=2) as scheduler:
+            pipeline = InstallPipeline(scheduler, needs_install=lambda x: int(x.info.name) % 2 == 0)
+            result = list(pipeline.run(mods))
+
+        self.assertEqual(result, [(mods[0], True), (mods[1], False), (mods[2], True), (mods[3], False)])
+        self.assertEqual([i.staged for i in mods], [True, False, True, False])
+
+    def test_extract_jobs(self):
+        mods = [ConcurrentMockedMod(str(i)) for i in range(6)]
+
+        with DownloadScheduler(Path('/tmp'), jobs=6) as scheduler:
+            pipeline = InstallPipeline(scheduler, download_ahead=6, extract_ahead=1, extract_jobs=3)
+            result = list(pipeline.run(mods))
+
+        self.assertEqual(result, [(i, True) for i in mods])
+        self.assertTrue(all(i.staged for i in mods))
+        self.assertGreater(ConcurrentMockedMod.max_running, 1)
+        self.assertLessEqual(ConcurrentMockedMod.max_running, 3)
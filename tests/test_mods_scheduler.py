@@ -0,0 +1,127 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Lock
+from time import monotonic, sleep
+from unittest import TestCase
+from unittest.mock import patch
+
+from launcher.exceptions import DownloadCancelledError
+from launcher.mods.downloader import DefaultDownloader
+from launcher.mods.downloader.base import stop_downloads
+from launcher.mods.info import ModInfo
+from launcher.mods.scheduler import DownloadScheduler
+
+from common import MockedResponse, data_dir
+
+
+class MockedMod:
+    "Fake installer tracking concurrent calls to download()"
+
+    running = 0
+    max_running = 0
+    lock = Lock()
+
+    def __init__(self, url: str, delay: float = 0.0) -> None:
+        self.info = ModInfo({'url': url})
+        self._delay = delay
+
+    def download(self, to: Path, use_cached: bool = False) -> Path:
+        with MockedMod.lock:
+            MockedMod.running += 1
+            MockedMod.max_running = max(MockedMod.max_running, MockedMod.running)
+
+        sleep(self._delay)
+
+        with MockedMod.lock:
+            MockedMod.running -= 1
+
+        if 'fail' in self.info.url:
+            raise ConnectionError('Mocked Error')
+
+        return to / Path(self.info.url).name
+
+
+class DownloadSchedulerTestCase(TestCase):
+
+    def setUp(self) -> None:
+        MockedMod.running = 0
+        MockedMod.max_running = 0
+
+    def test_ordered(self):
+        mods = [MockedMod(f'https://somewhere/{i}.7z', 0.01 * (5 - i)) for i in range(5)]
+
+        with DownloadScheduler(Path('/tmp'), jobs=5) as scheduler:
+            self.assertEqual(list(scheduler.ordered(mods)), mods)
+
+        self.assertGreater(MockedMod.max_running, 1)
+
+    def test_host_limit(self):
+        mods = [MockedMod(f'https://www.moddb.com/addons/start/{i}', 0.01) for i in range(6)]
+
+        with DownloadScheduler(Path('/tmp'), jobs=6, host_limits={'moddb.com': 1}) as scheduler:
+            self.assertEqual(len(list(scheduler.ordered(mods))), 6)
+
+        self.assertEqual(MockedMod.max_running, 1)
+
+    def test_error_raised_in_order(self):
+        mods = [MockedMod('https://somewhere/ok.7z'), MockedMod('https://somewhere/fail.7z')]
+
+        with self.assertRaises(ConnectionError), DownloadScheduler(Path('/tmp'), jobs=2) as scheduler:
+            it = scheduler.ordered(mods)
+            self.assertIs(next(it), mods[0])
+            next(it)
+
+    def test_outside_context(self):
+        with self.assertRaises(RuntimeError):
+            DownloadScheduler(Path('/tmp')).submit(MockedMod('https://somewhere/ok.7z'))
+
+    def test_running_downloads_stopped_on_error(self):
+        class EndlessResponse(MockedResponse):
+            def iter_content(self, *args, **kwargs):
+                while True:
+                    sleep(0.01)
+                    yield b'data'
+
+        class EndlessMod(MockedMod):
+            def download(self, to: Path, use_cached: bool = False) -> Path:
+                return DefaultDownloader(self.info.url).download(to, use_cached)
+
+        with TemporaryDirectory() as dir, \
+             patch('launcher.mods.downloader.g_session.get', return_value=EndlessResponse(200, None)):
+            start = monotonic()
+            with self.assertRaises(KeyboardInterrupt), DownloadScheduler(Path(dir), jobs=1) as scheduler:
+                future = scheduler.submit(EndlessMod('https://somewhere/endless.7z'))
+                sleep(0.1)
+                raise KeyboardInterrupt()
+
+            self.assertLess(monotonic() - start, 5)
+            self.assertIsInstance(future.exception(), DownloadCancelledError)
+            self.assertTrue((Path(dir) / 'endless.7z.part').is_file())
+            self.assertFalse(stop_downloads.is_set())
+
+    def test_shared_archive_downloaded_once(self):
+        class SlowResponse(MockedResponse):
+            def iter_content(self, *args, **kwargs):
+                sleep(0.05)
+                return super().iter_content(*args, **kwargs)
+
+        class DownloaderMod(MockedMod):
+            def __init__(self, url: str) -> None:
+                super().__init__(url)
+                self.downloader = DefaultDownloader(url)
+
+            def download(self, to: Path, use_cached: bool = False) -> Path:
+                return self.downloader.download(to, use_cached)
+
+        mods = [DownloaderMod('https://somewhere/shared.zip') for _ in range(2)]
+        with TemporaryDirectory() as dir, patch(
+            'launcher.mods.downloader.g_session.get', side_effect=lambda *a, **kw: SlowResponse(
+                200, data_dir / 'test.zip'
+            )
+        ) as mock_request:
+            with DownloadScheduler(Path(dir), jobs=2) as scheduler:
+                self.assertEqual(list(scheduler.ordered(mods)), mods)
+
+            mock_request.assert_called_once()
+            self.assertEqual([i.downloader.archive for i in mods], [Path(dir) / 'shared.zip'] * 2)
+            self.assertEqual((Path(dir) / 'shared.zip').read_bytes(), (data_dir / 'test.zip').read_bytes())
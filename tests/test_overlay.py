@@ -0,0 +1,88 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from launcher.overlay import Overlay, scan_tree
+
+
+class OverlayTestCase(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.root = Path(self._dir.name)
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _write(self, rel: str, content: str) -> None:
+        file = self.root / rel
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text(content)
+
+    def test_scan_tree(self):
+        self._write('a/gamedata/scripts/x.script', '')
+        self._write('a/readme', '')
+
+        self.assertEqual(
+            sorted(rel for rel, _ in scan_tree(self.root / 'a', 'p/')),
+            ['p/gamedata/scripts/x.script', 'p/readme']
+        )
+
+    def test_resolve_and_materialize(self):
+        self._write('anomaly/bin/xr.dll', 'anomaly')
+        self._write('anomaly/gamedata/a', 'anomaly')
+        self._write('mod1/gamedata/a', 'mod1')
+        self._write('mod1/bin/xr.dll', 'mod1')
+        self._write('mod2/gamedata/a', 'mod2')
+        self._write('mod2/gamedata/b', 'mod2')
+
+        overlay = Overlay()
+        overlay.add_layer('Anomaly', self.root / 'anomaly')
+        overlay.add_layer('mod1', self.root / 'mod1')
+        overlay.add_layer('mod2', self.root / 'mod2')
+        overlay.add_layer('Anomaly bin', self.root / 'anomaly' / 'bin', 'bin/')
+
+        self.assertEqual(overlay.conflicts, {
+            'gamedata/a': ['Anomaly', 'mod1', 'mod2'],
+            'bin/xr.dll': ['Anomaly', 'mod1', 'Anomaly bin'],
+        })
+        self.assertIn('  gamedata/a (overrides: Anomaly, mod1)', overlay.conflict_report())
+
+        state, written, removed = overlay.materialize(self.root / 'final')
+        self.assertEqual((len(state), written, removed), (3, 3, 0))
+        self.assertEqual((self.root / 'final' / 'gamedata' / 'a').read_text(), 'mod2')
+        self.assertEqual((self.root / 'final' / 'gamedata' / 'b').read_text(), 'mod2')
+        self.assertEqual((self.root / 'final' / 'bin' / 'xr.dll').read_text(), 'anomaly')
+
+    def test_incremental(self):
+        self._write('anomaly/gamedata/a', 'anomaly')
+        self._write('mod1/gamedata/a', 'mod1')
+        self._write('mod1/gamedata/scripts/b', 'mod1')
+        self._write('mod2/gamedata/c', 'mod2')
+
+        overlay = Overlay()
+        overlay.add_layer('Anomaly', self.root / 'anomaly')
+        overlay.add_layer('mod1', self.root / 'mod1')
+        overlay.add_layer('mod2', self.root / 'mod2')
+        state, *_ = overlay.materialize(self.root / 'final')
+        (self.root / 'final' / 'appdata').mkdir()
+        (self.root / 'final' / 'appdata' / 'user.ltx').write_text('game')
+
+        # mod1 disabled, mod2 updated
+        self._write('mod2/gamedata/c', 'mod2 v2')
+        overlay = Overlay()
+        overlay.add_layer('Anomaly', self.root / 'anomaly')
+        overlay.add_layer('mod2', self.root / 'mod2')
+        state, written, removed = overlay.materialize(self.root / 'final', previous=state)
+
+        self.assertEqual((written, removed), (2, 1))
+        self.assertEqual((self.root / 'final' / 'gamedata' / 'a').read_text(), 'anomaly')
+        self.assertEqual((self.root / 'final' / 'gamedata' / 'c').read_text(), 'mod2 v2')
+        self.assertFalse((self.root / 'final' / 'gamedata' / 'scripts').exists())
+        self.assertTrue((self.root / 'final' / 'appdata' / 'user.ltx').exists())
+
+        self.assertEqual(overlay.materialize(self.root / 'final', previous=state)[1:], (0, 0))
+
+    def test_missing_layer(self):
+        with self.assertRaises(FileNotFoundError):
+            Overlay().add_layer('missing', self.root / 'missing')
@@ -29,3 +29,21 @@ class DefaultTempDirTestCase(TestCase):
 
     def test_fix_path_and_case(self) -> None:
         self._decompress_and_check(data_dir / 'test-malformed-both.7z', 'FLAG.txt')
+
+    def test_fix_path_case_tree(self) -> None:
+        def extract(dir: Path) -> None:
+            for i in ('Gamedata/Scripts/a.script', 'Gamedata/Textures/UI/B.dds', 'Gamedata/NoExtension',
+                      'gamedata/scripts/c.script', 'Option/GameData/Configs/d.ltx', 'Other/Scripts/e'):
+                (dir / i).parent.mkdir(parents=True, exist_ok=True)
+                (dir / i).write_text('success')
+
+        with DefaultTempDir(extract, prefix='gamma-launcher-tempdir-test-') as pdir:
+            self.assertEqual(sorted(str(i.relative_to(pdir)) for i in pdir.glob('**/*') if i.is_file()), [
+                'Option/gamedata/configs/d.ltx',
+                'Other/Scripts/e',
+                'gamedata/NoExtension',
+                'gamedata/scripts/a.script',
+                'gamedata/scripts/c.script',
+                'gamedata/textures/ui/B.dds',
+            ])
+            self.assertFalse((pdir / 'Gamedata').exists())